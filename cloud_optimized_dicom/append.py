@@ -173,10 +173,10 @@ def _dedupe(
                     conflict.append(instance)
                     if is_remote(instance.dicom_uri):
                         preexisting_instance.append_diff_hash_dupe(instance.dicom_uri)
-                    logger.warning(f"Removing diff hash dupe from input: {instance}")
+                    logger.warning("Removing diff hash dupe from input: %s", instance)
                 else:
                     same.append(instance)
-                    logger.warning(f"Removing true duplicate from input: {instance}")
+                    logger.warning("Removing true duplicate from input: %s", instance)
                 continue
             # if we make it here, we have a unique instance id
             instance_id_to_instance[instance_id] = instance
@@ -339,7 +339,9 @@ def _handle_same(
     for dupe_instance, series_metadata, deid_instance_uid in same_state_changes:
         existing_path = series_metadata.instances[deid_instance_uid].dicom_uri
         logger.warning(
-            f"Skipping duplicate instance (same hash): {dupe_instance} (duplicate of {existing_path})"
+            "Skipping duplicate instance (same hash): %s (duplicate of %s)",
+            dupe_instance,
+            existing_path,
         )
     # update append result
     return AppendResult(
@@ -363,7 +365,9 @@ def _handle_diff(
         existing_instance = series_metadata.instances[deid_instance_uid]
         # add novel (not already in diff_hash_dupe_paths), remote dupe uris to diff_hash_dupe_paths
         logger.warning(
-            f"Skipping duplicate instance (diff hash): {dupe_instance} (duplicate of {existing_instance.dicom_uri})"
+            "Skipping duplicate instance (diff hash): %s (duplicate of %s)",
+            dupe_instance,
+            existing_instance.dicom_uri,
         )
         if existing_instance.append_diff_hash_dupe(dupe_instance._original_path):
             # metadata is now desynced because we added to diff_hash_dupe_paths
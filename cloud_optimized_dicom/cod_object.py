@@ -5,6 +5,7 @@ from tempfile import TemporaryDirectory
 from typing import Callable, Optional, Union
 
 import numpy as np
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 from google.cloud.storage.constants import STANDARD_STORAGE_CLASS
 from google.cloud.storage.retry import DEFAULT_RETRY
@@ -57,6 +58,7 @@ class CODObject:
         create_if_missing: bool - If `False`, raise an error if series does not yet exist in the datastore.
         temp_dir: str - If a temp_dir with data pertaining to this series already exists, provide it here.
         override_errors: bool - If `True`, delete any existing error.log and upload a new one.
+        metadata_cache_dir: str - If provided, metadata is cached on local disk here (by generation), so reloading unchanged metadata skips the download.
         lock_generation: int - The generation of the lock file. Should only be set if instantiation from serialized cod object.
     """
 
@@ -74,6 +76,7 @@ class CODObject:
         create_if_missing: bool = True,
         temp_dir: str = None,
         override_errors: bool = False,
+        metadata_cache_dir: str = None,
         # fields user should not set
         lock_generation: int = None,
         metadata: SeriesMetadata = None,
@@ -90,6 +93,7 @@ class CODObject:
         self._metadata = metadata
         self.temp_dir = temp_dir
         self.override_errors = override_errors
+        self.metadata_cache_dir = metadata_cache_dir
         self.lock_generation = lock_generation
         # check for error.log existence - if it exists, fail initialization
         if (
@@ -200,8 +204,16 @@ class CODObject:
             uri=self.metadata_uri,
             client=self.client,
         )
-        if metadata_blob.exists():
-            self._metadata = SeriesMetadata.from_blob(metadata_blob)
+        # reload() checks existence in the same request that fetches the blob size, which from_blob uses to parallelize large downloads
+        try:
+            metadata_blob.reload()
+            metadata_exists = True
+        except NotFound:
+            metadata_exists = False
+        if metadata_exists:
+            self._metadata = SeriesMetadata.from_blob(
+                metadata_blob, cache_dir=self.metadata_cache_dir
+            )
         elif create_if_missing:
             self._metadata = SeriesMetadata(
                 study_uid=self.study_uid,
@@ -642,6 +654,8 @@ class CODObject:
         Update tar and metadata sync flags accordingly.
         """
         if os.path.exists(self.tar_file_path):
+            # release cached handles on the tar first, or its disk space stays allocated after removal
+            Instance.close_cached_tars(self.tar_file_path)
             os.remove(self.tar_file_path)
             # if the tar existed, we changed it, so we know for sure it is not synced
             self._tar_synced = False
@@ -680,11 +694,7 @@ class CODObject:
         """
         instance_uid_to_local_path = self._set_dicom_uris_to_datastore()
         metadata_blob = storage.Blob.from_string(self.metadata_uri, client=self.client)
-        metadata_blob.content_encoding = "gzip"
-        compressed_metadata = self._metadata.to_gzipped_json()
-        metadata_blob.upload_from_string(
-            compressed_metadata, content_type="application/json", retry=DEFAULT_RETRY
-        )
+        self._metadata.upload_gzipped_json(metadata_blob, retry=DEFAULT_RETRY)
         metrics.STORAGE_CLASS_COUNTERS["CREATE"][metadata_blob.storage_class].inc()
         # set the dicom_uri of each instance back to the local path
         for uid, local_path in instance_uid_to_local_path.items():
@@ -747,6 +757,8 @@ class CODObject:
         """Clean temp dir (if not done already)"""
         # clean up temp dir
         if self.temp_dir and isinstance(self.temp_dir, TemporaryDirectory):
+            # release cached handles on the series tar first, or its disk space stays allocated after removal
+            Instance.close_cached_tars(self.temp_dir.name)
             self.temp_dir.cleanup()
             self.temp_dir = None
 
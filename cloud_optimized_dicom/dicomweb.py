@@ -1,6 +1,7 @@
 import dataclasses
 import os
 import re
+from functools import lru_cache
 from tempfile import NamedTemporaryFile
 from typing import Iterator, Optional
 
@@ -34,7 +35,7 @@ def _validate_frame_request(instance: Instance, requested_frames: list[int]):
     assert (
         instance.has_pixeldata
     ), f"Cannot fetch frames for instance {instance.dicom_uri} because it has no pixel data"
-    if hasattr(instance.metadata, "00280008"):
+    if "00280008" in instance.metadata:
         num_frames = instance.metadata["00280008"]["Value"][0]
     else:
         assert (
@@ -103,7 +104,39 @@ STUDY_LEVEL_TAGS = [
 ]
 
 
-@dataclasses.dataclass
+@lru_cache(maxsize=4096)
+def _parse_uri(
+    uri: str,
+) -> tuple[str, str, Optional[str], Optional[str], tuple[int, ...]]:
+    """
+    Parse the URI of a dicomweb request into `(datastore_uri, study_uid, series_uid, instance_uid, frames)`.
+    Parsing is pure, so results are cached for URIs that recur (retries, polling, per-frame requests).
+    Frames are returned as a tuple so the cached value cannot be mutated by callers.
+    """
+    assert uri.startswith("gs://"), "Only gs:// URIs are supported"
+    assert "?" not in uri, "Query parameters are not supported"
+    assert "/studies/" in uri, "study must be specified (expected '/studies/' in URI)"
+
+    # Extract all fields using the helper method
+    datastore_uri = uri.split("/studies/")[0]
+    study_uid = _extract_from_uri(uri, "/studies/")
+    series_uid = _extract_from_uri(uri, "/series/")
+    instance_uid = _extract_from_uri(uri, "/instances/")
+    frames_str = _extract_from_uri(uri, "/frames/")
+
+    # Convert frames string to tuple of integers if present
+    frames = tuple(int(f) for f in frames_str.split(",")) if frames_str else ()
+
+    # right now, we only support metadata requests for non-frame-level requests
+    if not frames:
+        assert uri.endswith(
+            "/metadata"
+        ), "Expected /metadata suffix if request is not frame-level"
+
+    return datastore_uri, study_uid, series_uid, instance_uid, frames
+
+
+@dataclasses.dataclass(slots=True)
 class DicomwebRequest:
     """
     A dataclass representing a dicomweb request
@@ -154,12 +187,13 @@ class DicomwebRequest:
         # make frame indices 0-indexed (in dicomweb requests, frames are 1-indexed)
         frame_indices = [i - 1 for i in self.frames]
         _validate_frame_request(instance, frame_indices)
-        start_byte, end_byte = instance._byte_offsets
+        start_byte, stop_byte = instance._byte_offsets
         tar_blob = storage.Blob.from_string(cod_obj.tar_uri, client=client)
         # download just the bytes of the instance in question
+        # (byte offsets hold an exclusive stop, whereas download_to_filename takes an inclusive end byte)
         with NamedTemporaryFile(suffix=".dcm") as temp_file:
             tar_blob.download_to_filename(
-                temp_file.name, start=start_byte, end=end_byte
+                temp_file.name, start=start_byte, end=stop_byte - 1
             )
             with pydicom3.dcmread(temp_file.name) as ds:
                 # TODO: this returns raw frame bytes... do we want to support transcoding to jpg?
@@ -179,9 +213,8 @@ class DicomwebRequest:
             lock=False,
             create_if_missing=False,
         )
-        return cod_obj.get_metadata(dirty=True).to_dict()["cod"]["instances"][
-            self.instance_uid
-        ]["metadata"]
+        # navigate straight to the one instance, rather than serializing the whole series via to_dict()
+        return cod_obj.get_metadata(dirty=True).instances[self.instance_uid].metadata
 
     def _handle_series_level_request(self, client: storage.Client):
         """For a series-level request, return a list of metadata for each instance"""
@@ -194,10 +227,8 @@ class DicomwebRequest:
             create_if_missing=False,
         )
         return [
-            i_dict["metadata"]
-            for i_dict in cod_obj.get_metadata(dirty=True)
-            .to_dict()["cod"]["instances"]
-            .values()
+            instance.metadata
+            for instance in cod_obj.get_metadata(dirty=True).instances.values()
         ]
 
     def _handle_study_level_request(self, client: storage.Client):
@@ -222,34 +253,14 @@ class DicomwebRequest:
         Parse the URI of a dicomweb request (e.g. `{s}/studies/{study}/series/{series}`)
         and return a DicomwebRequest object.
         """
-        assert uri.startswith("gs://"), "Only gs:// URIs are supported"
-        assert "?" not in uri, "Query parameters are not supported"
-        assert (
-            "/studies/" in uri
-        ), "study must be specified (expected '/studies/' in URI)"
-
-        # Extract all fields using the helper method
-        datastore_uri = uri.split("/studies/")[0]
-        study_uid = _extract_from_uri(uri, "/studies/")
-        series_uid = _extract_from_uri(uri, "/series/")
-        instance_uid = _extract_from_uri(uri, "/instances/")
-        frames_str = _extract_from_uri(uri, "/frames/")
-
-        # Convert frames string to list of integers if present
-        frames = [int(f) for f in frames_str.split(",")] if frames_str else []
-
-        # right now, we only support metadata requests for non-frame-level requests
-        if not frames:
-            assert uri.endswith(
-                "/metadata"
-            ), "Expected /metadata suffix if request is not frame-level"
-
+        datastore_uri, study_uid, series_uid, instance_uid, frames = _parse_uri(uri)
         return cls(
             datastore_uri=datastore_uri,
             study_uid=study_uid,
             series_uid=series_uid,
             instance_uid=instance_uid,
-            frames=frames,
+            # _parse_uri is cached, so hands back an immutable tuple
+            frames=list(frames),
         )
 
     @classmethod
@@ -269,5 +280,7 @@ class DicomwebRequest:
 def handle_request(request: str, client: storage.Client) -> dict:
     """
     Handle a dicomweb request and return the response.
+    When serving many requests, reuse one client across them (see `utils.create_pooled_storage_client`)
+    so connections are kept alive rather than re-established per request.
     """
     return DicomwebRequest.from_request(request).handle(client)
@@ -1,7 +1,10 @@
 from dataclasses import dataclass
 
+# human-readable names of the hint fields, in the order Hints.validate compares them
+_HINT_FIELDS = ("size", "crc32c", "instance uid", "series uid", "study uid")
 
-@dataclass
+
+@dataclass(slots=True)
 class Hints:
     """Instance-related values that COD takes at face value when optimizing, but will be verified prior to state change.
 
@@ -36,21 +39,20 @@ class Hints:
         Raises:
             AssertionError if any hint was provided and does not match the true value.
         """
-        if self.size is not None:
-            assert self.size == true_size, f"size mismatch: {self.size} != {true_size}"
-        if self.crc32c is not None:
-            assert (
-                self.crc32c == true_crc32c
-            ), f"crc32c mismatch: {self.crc32c} != {true_crc32c}"
-        if self.instance_uid is not None:
-            assert (
-                self.instance_uid == true_instance_uid
-            ), f"instance uid mismatch: {self.instance_uid} != {true_instance_uid}"
-        if self.series_uid is not None:
-            assert (
-                self.series_uid == true_series_uid
-            ), f"series uid mismatch: {self.series_uid} != {true_series_uid}"
-        if self.study_uid is not None:
-            assert (
-                self.study_uid == true_study_uid
-            ), f"study uid mismatch: {self.study_uid} != {true_study_uid}"
+        provided = (
+            self.size,
+            self.crc32c,
+            self.instance_uid,
+            self.series_uid,
+            self.study_uid,
+        )
+        truth = (
+            true_size,
+            true_crc32c,
+            true_instance_uid,
+            true_series_uid,
+            true_study_uid,
+        )
+        for name, hint, true_value in zip(_HINT_FIELDS, provided, truth):
+            if hint is not None and hint != true_value:
+                raise AssertionError(f"{name} mismatch: {hint} != {true_value}")
@@ -1,26 +1,39 @@
+import io
 import logging
+import mmap
 import os
+import shutil
 import tarfile
 import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Callable, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 import pydicom3
+from google.cloud import storage
 from ratarmountcore import open as rmc_open
 from smart_open import open as smart_open
 
 import cloud_optimized_dicom.metrics as metrics
 from cloud_optimized_dicom.custom_offset_tables import get_multiframe_offset_tables
+from cloud_optimized_dicom.errors import HashMismatchError
 from cloud_optimized_dicom.hints import Hints
 from cloud_optimized_dicom.utils import (
-    DICOM_PREAMBLE,
+    Crc32cWriter,
+    _batch_delete_gcs_deps,
     _delete_gcs_dep,
+    _get_gcs_client,
     file_is_dicom,
-    find_pattern,
     generate_ptr_crc32c,
+    generate_ptr_crc32c_and_size,
     is_remote,
     parse_uids_from_metadata,
+    read_at,
+    read_key_uids,
+    sendfile_copy,
 )
 from cloud_optimized_dicom.virtual_file import VirtualFile
 
@@ -28,9 +41,131 @@ logger = logging.getLogger(__name__)
 
 TAR_IDENTIFIER = ".tar://"
 ZIP_IDENTIFIER = ".zip://"
+# buffer size used when streaming remote instances to local disk
+FETCH_CHUNK_SIZE = 2**20
+# validate_many only starts a process pool for at least this many local instances (below it, process start-up costs more than it saves)
+VALIDATE_PROCESS_POOL_MIN_INSTANCES = 32
+# tar members up to this size are copied out of the tar mmap into a BytesIO rather than wrapped in a VirtualFile
+SMALL_TAR_MEMBER_SIZE = 16 * 2**20
 
 
-@dataclass
+# open ratarmount archives, keyed by tar path (see _get_archive)
+_ARCHIVE_CACHE_SIZE = 8
+_archive_cache: OrderedDict[str, tuple[tuple, object]] = OrderedDict()
+_archive_cache_lock = threading.Lock()
+
+
+def _get_archive(tar_path: str):
+    """Return an open ratarmount archive for `{tar_path}.tar`, reusing a cached handle when possible.
+
+    Opening an archive means (re)reading its index, so handles are kept open and shared across instances of the same tar.
+    The cache key includes the tar's size/mtime and whether an index file exists, so a tar that has since been
+    appended to (or indexed) is re-opened rather than served stale.
+    As with `_get_tar_mmap`, stale and evicted archives are dropped rather than closed, as other threads may still be
+    reading members from them; they are closed once garbage collected.
+    """
+    tar_file = f"{tar_path}.tar"
+    index_file = f"{tar_path}.index.sqlite"
+    stat = os.stat(tar_file)
+    has_index = os.path.exists(index_file)
+    key = (stat.st_size, stat.st_mtime_ns, has_index)
+    with _archive_cache_lock:
+        cached = _archive_cache.get(tar_path)
+        if cached is not None and cached[0] == key:
+            _archive_cache.move_to_end(tar_path)
+            return cached[1]
+    # opening reads (or builds) the index, so do it outside the lock rather than serializing every tar open
+    options = {"indexFilePath": index_file} if has_index else {}
+    archive = rmc_open(tar_file, **options)
+    with _archive_cache_lock:
+        cached = _archive_cache.get(tar_path)
+        if cached is not None and cached[0] == key:
+            # another thread opened the same tar meanwhile; use theirs (ours was never shared, so is safe to close)
+            _archive_cache.move_to_end(tar_path)
+            archive.close()
+            return cached[1]
+        _archive_cache[tar_path] = (key, archive)
+        # evict least recently used archives
+        while len(_archive_cache) > _ARCHIVE_CACHE_SIZE:
+            _archive_cache.popitem(last=False)
+        return archive
+
+
+# read-only mmaps of local tars, keyed by tar file path (see _get_tar_mmap)
+_tar_mmap_cache: OrderedDict[str, tuple[tuple, mmap.mmap]] = OrderedDict()
+
+
+def _get_tar_mmap(tar_file: str) -> Optional[mmap.mmap]:
+    """Return a read-only mmap of `tar_file`, shared by every instance read from that tar.
+
+    Instances read from the same tar then share one mapping (and the page cache) instead of each opening a new file handle.
+    As with `_get_archive`, the key includes size/mtime so a tar that has been appended to is re-mapped.
+    Stale mappings are dropped rather than closed, as open VirtualFiles may still be reading from them.
+    Returns None if the file cannot be mapped (e.g. it is empty), in which case the caller should fall back to open().
+    """
+    stat = os.stat(tar_file)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _archive_cache_lock:
+        cached = _tar_mmap_cache.get(tar_file)
+        if cached is not None and cached[0] == key:
+            _tar_mmap_cache.move_to_end(tar_file)
+            return cached[1]
+    try:
+        with open(tar_file, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    with _archive_cache_lock:
+        cached = _tar_mmap_cache.get(tar_file)
+        if cached is not None and cached[0] == key:
+            # another thread mapped the same tar meanwhile; share theirs
+            _tar_mmap_cache.move_to_end(tar_file)
+            mapping.close()
+            return cached[1]
+        _tar_mmap_cache[tar_file] = (key, mapping)
+        while len(_tar_mmap_cache) > _ARCHIVE_CACHE_SIZE:
+            _tar_mmap_cache.popitem(last=False)
+        return mapping
+
+
+_KEY_VALUE_TAGS = [
+    "SOPInstanceUID",
+    "SeriesInstanceUID",
+    "StudyInstanceUID",
+    "PixelData",
+]
+
+
+def _read_key_values(f) -> tuple[str, str, str, bool]:
+    """Return (instance_uid, series_uid, study_uid, has_pixeldata) for an open dicom file.
+    Tries the lightweight header walk in `read_key_uids` first, falling back to a pydicom parse.
+    """
+    if (values := read_key_uids(f)) is not None:
+        return values
+    f.seek(0)
+    # only parse the elements we need (PixelData is included, and deferred, so presence can be checked)
+    with pydicom3.dcmread(f, defer_size=1024, specific_tags=_KEY_VALUE_TAGS) as ds:
+        return (
+            getattr(ds, "SOPInstanceUID"),
+            getattr(ds, "SeriesInstanceUID"),
+            getattr(ds, "StudyInstanceUID"),
+            hasattr(ds, "PixelData"),
+        )
+
+
+def _read_local_instance_values(path: str) -> tuple[str, str, str, bool, str, int]:
+    """Read (instance_uid, series_uid, study_uid, has_pixeldata, crc32c, size) from a local dicom file.
+    Module-level (and taking only a path) so it can run in a worker process for `Instance.validate_many`.
+    """
+    with open(path, "rb") as f:
+        assert file_is_dicom(f), f"File is not a valid DICOM: {path}"
+        instance_uid, series_uid, study_uid, has_pixeldata = _read_key_values(f)
+        f.seek(0)
+        crc32c, size = generate_ptr_crc32c_and_size(f)
+    return instance_uid, series_uid, study_uid, has_pixeldata, crc32c, size
+
+
+@dataclass(slots=True)
 class Instance:
     """Object representing a single DICOM instance.
 
@@ -55,8 +190,13 @@ class Instance:
     _metadata: dict[str, dict] = None
     _custom_offset_tables: dict = None
     _diff_hash_dupe_paths: list[str] = field(default_factory=list)
-    _modified_datetime: str = datetime.now().isoformat()
+    # set mirror of _diff_hash_dupe_paths for O(1) membership checks (the list is kept for ordered serialization)
+    _diff_hash_dupe_set: set[str] = field(
+        default_factory=set, init=False, repr=False, compare=False
+    )
+    _modified_datetime: str = None
     _original_path: str = None
+    # (start, stop) of the instance's bytes within its tar. stop is exclusive (start + size), so the bytes are tar[start:stop]
     _byte_offsets: tuple[int, int] = None
     # uids/cached values
     _instance_uid: str = None
@@ -65,11 +205,19 @@ class Instance:
     _size: int = None
     _crc32c: str = None
     _has_pixeldata: bool = None
+    # (uid_hash_func, {uid: hashed uid}) memo for _hash_uid
+    _hashed_uid_cache: Optional[tuple[Callable, dict[str, str]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
         # if original_path is not set, set it to dicom_uri
         if not self._original_path:
             self._original_path = self.dicom_uri
+        self._diff_hash_dupe_set = set(self._diff_hash_dupe_paths)
+        # default modified_datetime to creation time (per instance, not per import of this module)
+        if self._modified_datetime is None:
+            self._modified_datetime = datetime.now().isoformat()
 
     @property
     def is_nested_in_tar(self) -> bool:
@@ -93,15 +241,30 @@ class Instance:
             )
 
         # we store the path, not the file object, so that instances can be pickled (allows them to be passed between beam.DoFns)
-        with tempfile.NamedTemporaryFile(suffix=".dcm", delete=False) as temp_file:
-            self._temp_file_path = temp_file.name
-
-        # read remote file into local temp file
-        with open(self._temp_file_path, "wb") as local_file:
-            with smart_open(
-                uri=self.dicom_uri, mode="rb", transport_params=self.transport_params
-            ) as source:
-                local_file.write(source.read())
+        fd, self._temp_file_path = tempfile.mkstemp(suffix=".dcm")
+
+        # stream the remote file into the local temp file, computing crc32c and size as the bytes go by
+        # (so validate() does not need a second pass over the file to checksum it)
+        with os.fdopen(fd, "wb") as local_file:
+            writer = Crc32cWriter(local_file)
+            # gs:// (the common production case): download directly with the storage client
+            # (the one in transport_params if provided, otherwise a shared default client rather than one per fetch).
+            # checksum=None skips the client's own hash pass, since we are already computing crc32c
+            if self.dicom_uri.startswith("gs://"):
+                client = self.transport_params.get("client") or _get_gcs_client()
+                blob = storage.Blob.from_string(self.dicom_uri, client=client)
+                blob.download_to_file(writer, checksum=None)
+            # otherwise, read remote file via smart_open
+            else:
+                with smart_open(
+                    uri=self.dicom_uri,
+                    mode="rb",
+                    transport_params=self.transport_params,
+                ) as source:
+                    # stream through a bounded buffer rather than reading the whole file into memory
+                    shutil.copyfileobj(source, writer, length=FETCH_CHUNK_SIZE)
+        self._crc32c = writer.crc32c()
+        self._size = writer.size
         # after writing, dicom_uri is now local
         self.dicom_uri = self._temp_file_path
         self.validate()
@@ -114,12 +277,10 @@ class Instance:
             self.dicom_uri
         ), f"extract_from_local_tar expected local tar uri but got: {self.dicom_uri}"
         # create a temp file to store the instance
-        with tempfile.NamedTemporaryFile(suffix=".dcm", delete=False) as temp_file:
-            self._temp_file_path = temp_file.name
+        fd, self._temp_file_path = tempfile.mkstemp(suffix=".dcm")
         # read the instance from the tar into the temp file
-        with self.open() as f_in:
-            with open(self._temp_file_path, "wb") as f_out:
-                f_out.write(f_in.read())
+        with os.fdopen(fd, "wb") as f_out, self.open() as f_in:
+            shutil.copyfileobj(f_in, f_out, length=FETCH_CHUNK_SIZE)
         # after writing, dicom_uri is now local
         self.dicom_uri = self._temp_file_path
         self.validate()
@@ -134,18 +295,28 @@ class Instance:
         """
         # populate all true values
         with self.open() as f:
-            with pydicom3.dcmread(f, defer_size=1024) as ds:
-                self._instance_uid = getattr(ds, "SOPInstanceUID")
-                self._series_uid = getattr(ds, "SeriesInstanceUID")
-                self._study_uid = getattr(ds, "StudyInstanceUID")
-                self._has_pixeldata = hasattr(ds, "PixelData")
-            # seek back to beginning of file to calculate crc32c
-            f.seek(0)
-            self._crc32c = generate_ptr_crc32c(f)
-        # compute size if not already set (if it's a tar, _open_tar will have set it)
+            (
+                self._instance_uid,
+                self._series_uid,
+                self._study_uid,
+                self._has_pixeldata,
+            ) = _read_key_values(f)
+            # seek back to beginning of file to calculate crc32c (unless fetch/_open_tar already computed it)
+            # (the checksum pass also yields the size, saving a stat below)
+            if self._crc32c is None:
+                f.seek(0)
+                self._crc32c, size = generate_ptr_crc32c_and_size(f)
+                if not self._size:
+                    self._size = size
+        # compute size if not already set (if it's a tar or was fetched, _open_tar/fetch will have set it)
         if not self._size:
             self._size = os.path.getsize(self.dicom_uri)
         # validate hints
+        self._validate_hints()
+        return True
+
+    def _validate_hints(self):
+        """Validate the (already populated) true values against self.hints"""
         self.hints.validate(
             true_size=self._size,
             true_crc32c=self._crc32c,
@@ -153,6 +324,83 @@ class Instance:
             true_series_uid=self._series_uid,
             true_study_uid=self._study_uid,
         )
+
+    @classmethod
+    def prefetch(
+        cls, instances: Iterable["Instance"], max_workers: int = 16
+    ) -> Iterator["Instance"]:
+        """Yield `instances` in order, fetching up to `max_workers` instances ahead on background threads.
+
+        Lets a caller process one instance while the next ones download, e.g.
+        ```
+        for instance in Instance.prefetch(instances):
+            instance.extract_metadata(...)
+        ```
+        Each instance is yielded only once its fetch has completed; fetch errors are raised when that instance is reached.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for instance in instances:
+                pending.append((instance, executor.submit(instance.fetch)))
+                if len(pending) > max_workers:
+                    ready, future = pending.popleft()
+                    future.result()
+                    yield ready
+            while pending:
+                ready, future = pending.popleft()
+                future.result()
+                yield ready
+
+    @classmethod
+    def validate_many(
+        cls, instances: list["Instance"], max_workers: Optional[int] = None
+    ) -> bool:
+        """Validate many instances in parallel (same result as calling `validate()` on each).
+
+        Remote instances are fetched (and thereby validated) on a thread pool, as that work is I/O-bound.
+        Members of remote tars cannot be fetched, so are validated (via a ranged read) on the same thread pool.
+        Local, non-tar instances are parsed and checksummed on a process pool, as that work is CPU-bound
+        (unless there are fewer than `VALIDATE_PROCESS_POOL_MIN_INSTANCES` of them, in which case they are validated inline).
+        Instances nested in local tars are validated serially.
+
+        Raises:
+            AssertionError if any instance is invalid.
+        """
+        remote = [i for i in instances if is_remote(i.dicom_uri)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(
+                executor.map(
+                    lambda i: i.validate() if i.is_nested_in_tar else i.fetch(),
+                    remote,
+                )
+            )
+        # remote instances are now validated (tar members) or local and validated (fetched); only validate the rest
+        remote_ids = {id(i) for i in remote}
+        local = [i for i in instances if id(i) not in remote_ids]
+        plain = [i for i in local if not i.is_nested_in_tar]
+        for instance in local:
+            if instance.is_nested_in_tar:
+                instance.validate()
+        if len(plain) < VALIDATE_PROCESS_POOL_MIN_INSTANCES or max_workers == 1:
+            for instance in plain:
+                instance.validate()
+            return True
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                _read_local_instance_values,
+                [i.dicom_uri for i in plain],
+                chunksize=16,
+            )
+            for instance, values in zip(plain, results):
+                (
+                    instance._instance_uid,
+                    instance._series_uid,
+                    instance._study_uid,
+                    instance._has_pixeldata,
+                    instance._crc32c,
+                    instance._size,
+                ) = values
+                instance._validate_hints()
         return True
 
     @property
@@ -211,7 +459,7 @@ class Instance:
             raise ValueError(
                 f"hashed_instance_uid called on instance with no uid_hash_func: {self}"
             )
-        return self.uid_hash_func(
+        return self._hash_uid(
             self.instance_uid(trust_hints_if_available=trust_hints_if_available)
         )
 
@@ -233,7 +481,7 @@ class Instance:
             raise ValueError(
                 f"hashed_series_uid called on instance with no uid_hash_func: {self}"
             )
-        return self.uid_hash_func(
+        return self._hash_uid(
             self.series_uid(trust_hints_if_available=trust_hints_if_available)
         )
 
@@ -255,7 +503,7 @@ class Instance:
             raise ValueError(
                 f"hashed_study_uid called on instance with no uid_hash_func: {self}"
             )
-        return self.uid_hash_func(
+        return self._hash_uid(
             self.study_uid(trust_hints_if_available=trust_hints_if_available)
         )
 
@@ -271,6 +519,11 @@ class Instance:
         """
         Open an instance and return a file pointer to its bytes, which can be given to pydicom.dcmread()
         """
+        # a remote tar member with known byte offsets can be fetched directly with a ranged read
+        if self._can_range_fetch():
+            ptr = self._open_remote_tar_range()
+            assert file_is_dicom(ptr), f"File is not a valid DICOM: {self.dicom_uri}"
+            return ptr
         self.fetch()
         if self.is_nested_in_tar:
             ptr = self._open_tar()
@@ -279,34 +532,73 @@ class Instance:
         assert file_is_dicom(ptr), f"File is not a valid DICOM: {self.dicom_uri}"
         return ptr
 
+    def _can_range_fetch(self) -> bool:
+        """Whether the instance is a member of a remote (GCS) tar whose byte offsets are already known"""
+        return (
+            self.is_nested_in_tar
+            and self._byte_offsets is not None
+            and self.dicom_uri.startswith("gs://")
+        )
+
+    def _open_remote_tar_range(self):
+        """Download only the instance's byte range of its remote tar, rather than the whole tar.
+
+        The range is not pinned to a tar generation, so if the instance's crc32c is already known
+        (e.g. from metadata), the downloaded bytes are checked against it; a mismatch means the tar
+        was rewritten since the byte offsets were recorded.
+        """
+        tar_path, _ = self.dicom_uri.split(TAR_IDENTIFIER)
+        client = self.transport_params.get("client") or _get_gcs_client()
+        blob = storage.Blob.from_string(f"{tar_path}.tar", client=client)
+        # byte_offsets hold an exclusive stop, whereas download_as_bytes takes an inclusive end byte
+        start, stop = self._byte_offsets
+        data = blob.download_as_bytes(start=start, end=stop - 1, checksum=None)
+        ptr = io.BytesIO(data)
+        crc32c = generate_ptr_crc32c(ptr)
+        ptr.seek(0)
+        if self._crc32c is None:
+            self._crc32c = crc32c
+        elif crc32c != self._crc32c:
+            metrics.TAR_METADATA_CRC32C_MISMATCH.inc()
+            raise HashMismatchError(
+                f"Hash mismatch between tar byte range and metadata: {self}"
+            )
+        if not self._size:
+            self._size = len(data)
+        return ptr
+
     def _open_tar(self):
         """Return a pointer to the instance (within a tar)"""
         assert self.is_nested_in_tar, f"_open_tar called on non-tar: {self.dicom_uri}"
         # if byte_offsets are not set, we need to find the file in the tar
         tar_path, internal_path = self.dicom_uri.split(TAR_IDENTIFIER)
         # if origin_uri is a tar, we need to find the file in the tar
+        # (if they are set, we skip the archive entirely and go straight to the bytes)
         if not self._byte_offsets:
-            options = {}
-            if os.path.exists(f"{tar_path}.index.sqlite"):
-                options = {"indexFilePath": f"{tar_path}.index.sqlite"}
-            with rmc_open(f"{tar_path}.tar", **options) as archive:
-                internal_file_info = archive.getFileInfo(internal_path)
-                if not internal_file_info:
-                    raise FileNotFoundError(f"File not found in tar: {internal_path}")
-                # set size if necessary
-                if not self._size:
-                    self._size = internal_file_info.size
-                # with size guaranteed, we can compute byte offsets
-                start_byte = internal_file_info.userdata[0].offset
-                self._byte_offsets = start_byte, start_byte + self._size - 1
-                # set crc32c if necessary
-                if not self._crc32c:
-                    with archive.open(internal_file_info) as instance_file:
-                        self._crc32c = generate_ptr_crc32c(instance_file)
+            archive = _get_archive(tar_path)
+            internal_file_info = archive.getFileInfo(internal_path)
+            if not internal_file_info:
+                raise FileNotFoundError(f"File not found in tar: {internal_path}")
+            # set size if necessary
+            if not self._size:
+                self._size = internal_file_info.size
+            # with size guaranteed, we can compute byte offsets
+            start_byte = internal_file_info.userdata[0].offset
+            self._byte_offsets = start_byte, start_byte + self._size
+            # set crc32c if necessary
+            if not self._crc32c:
+                with archive.open(internal_file_info) as instance_file:
+                    self._crc32c = generate_ptr_crc32c(instance_file)
         # with byte_offsets guaranteed, we can now return a file pointer
+        start, stop = self._byte_offsets
+        # prefer the shared mmap of the tar (which the virtual file must not close), else a dedicated file handle
+        tar_mmap = _get_tar_mmap(f"{tar_path}.tar")
+        if tar_mmap is not None:
+            # small members are cheaper to copy once than to parse through VirtualFile.read() calls
+            if stop - start <= SMALL_TAR_MEMBER_SIZE:
+                return io.BytesIO(tar_mmap[start:stop])
+            return VirtualFile(tar_mmap, start, stop, close_master=False)
         master_file_pointer = open(f"{tar_path}.tar", "rb")
-        # Add 1 to end byte to get stop position
-        start, stop = self._byte_offsets[0], self._byte_offsets[1] + 1
         return VirtualFile(master_file_pointer, start, stop)
 
     def append_to_series_tar(
@@ -329,22 +621,26 @@ class Instance:
         uid_for_uri = (
             self.hashed_instance_uid() if self.uid_hash_func else self.instance_uid()
         )
-        # do actual appending
+        # do actual appending. Rather than tar.add(), write the member header ourselves and copy the
+        # payload with sendfile; the data offset then falls directly out of the header length
         f = tar.fileobj
-        begin_offset = f.tell()
-        tar.add(self.dicom_uri, arcname=f"/instances/{uid_for_uri}.dcm")
-        end_offset = f.tell()
-        f.seek(begin_offset)
-        # TODO: if index is always 1536, we can skip the find pattern
-        index = find_pattern(f, DICOM_PREAMBLE)
-        if index != 1536:
-            logger.warning(f"Unexpected DICOM tar header size {index}")
-        if index == -1:
-            raise ValueError("Not a Valid DICOM")
-        start_offset = begin_offset + index
-        stop_offset = start_offset + self.size()
-        # Seek back to the end offset to read the file from the tar
-        f.seek(end_offset)
+        with open(self.dicom_uri, "rb") as src:
+            tarinfo = tar.gettarinfo(
+                arcname=f"instances/{uid_for_uri}.dcm", fileobj=src
+            )
+            header = tarinfo.tobuf(tar.format, tar.encoding, tar.errors)
+            begin_offset = f.tell()
+            f.write(header)
+            sendfile_copy(src, f, tarinfo.size)
+        # pad the payload out to a whole number of tar blocks (as tarfile.addfile would)
+        blocks, remainder = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+        if remainder > 0:
+            f.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+            blocks += 1
+        tar.offset += len(header) + blocks * tarfile.BLOCKSIZE
+        tar.members.append(tarinfo)
+        start_offset = begin_offset + len(header)
+        stop_offset = start_offset + tarinfo.size
 
         # set byte offsets
         self._byte_offsets = (start_offset, stop_offset)
@@ -370,9 +666,9 @@ class Instance:
                     """Given a bulk data element, return a dict containing this instance's output_uri
                     and the head 512 bytes of the element"""
                     # TODO would be nice to find a way to include the tail 512 bytes as well
-                    with self.open() as dcm_file:
-                        dcm_file.seek(el.file_tell)
-                        element_head = dcm_file.read(512)
+                    # reuse the already-open file (rather than re-opening the instance per element),
+                    # reading at the element's offset without disturbing the position pydicom relies on
+                    element_head = read_at(f, el.file_tell, 512)
                     return {
                         "uri": output_uri,
                         "head": element_head.decode("utf-8", errors="replace"),
@@ -404,25 +700,32 @@ class Instance:
                 temp_file.seek(0)
                 return generate_ptr_crc32c(temp_file)
 
+    def _hash_uid(self, uid: str) -> str:
+        """Memoized `self.uid_hash_func(uid)`: hashed uids are requested repeatedly (tar paths, metadata keys, logging),
+        and user hash functions may be expensive. The memo lives on the instance (so it is freed with it),
+        and is discarded if `uid_hash_func` is replaced.
+        """
+        cache = self._hashed_uid_cache
+        if cache is None or cache[0] is not self.uid_hash_func:
+            cache = self._hashed_uid_cache = (self.uid_hash_func, {})
+        hashed_uid = cache[1].get(uid)
+        if hashed_uid is None:
+            hashed_uid = cache[1][uid] = self.uid_hash_func(uid)
+        return hashed_uid
+
+    def _format_uid(self, uid: Optional[str]) -> Optional[str]:
+        """Return `uid` as it should be displayed: hashed if a uid_hash_func is set (and uid is populated), else as is"""
+        if not uid or self.uid_hash_func is None:
+            return uid
+        return self._hash_uid(uid)
+
     def __str__(self):
         """
         Return a string representation of the instance.
         """
-        iuid = (
-            self.hashed_instance_uid()
-            if self.uid_hash_func and self._instance_uid
-            else self._instance_uid
-        )
-        suid = (
-            self.hashed_series_uid()
-            if self.uid_hash_func and self._series_uid
-            else self._series_uid
-        )
-        stuid = (
-            self.hashed_study_uid()
-            if self.uid_hash_func and self._study_uid
-            else self._study_uid
-        )
+        iuid = self._format_uid(self._instance_uid)
+        suid = self._format_uid(self._series_uid)
+        stuid = self._format_uid(self._study_uid)
         return f"Instance(uri={self.dicom_uri}, hashed_uids={self.uid_hash_func is not None}, instance_uid={iuid}, series_uid={suid}, study_uid={stuid}, dependencies={self.dependencies})"
 
     def delete_dependencies(
@@ -437,6 +740,8 @@ class Instance:
             logger.info(f"COD_STATE_LOGS:DRYRUN:WOULD_DELETE:{self.dependencies}")
             return self.dependencies
         deleted_dependencies = []
+        # multiple GCS deps (no hash check applies) are deleted in one batch request after the loop
+        gcs_batch = []
         for uri in self.dependencies:
             # we do not handle nested dependencies (e.g. a dcm within a zip)
             if TAR_IDENTIFIER in uri or ZIP_IDENTIFIER in uri:
@@ -453,6 +758,10 @@ class Instance:
                     _delete_gcs_dep(
                         uri=uri, client=client, expected_crc32c=self.crc32c()
                     )
+                elif len(self.dependencies) > 1:
+                    # only added to deleted_dependencies once the batch confirms the delete
+                    gcs_batch.append(uri)
+                    continue
                 else:
                     _delete_gcs_dep(uri=uri, client=client)
                 deleted_dependencies.append(uri)
@@ -462,8 +771,12 @@ class Instance:
             else:
                 logger.warning(f"DEPENDENCY_DELETION:SKIP:FILE_DOES_NOT_EXIST:{uri}")
                 continue
+        if gcs_batch:
+            deleted_dependencies.extend(
+                _batch_delete_gcs_deps(uris=gcs_batch, client=client)
+            )
         # We don't want to spend GET requests to calculate exact deleted size. Instead we estimate with instance size
-        metrics.BYTES_DELETED_COUNTER.inc(self.size())
+        metrics.BYTES_DELETED_COUNTER.inc(self.size(trust_hints_if_available=True))
         return deleted_dependencies
 
     def append_diff_hash_dupe(self, duplicate_path: str) -> bool:
@@ -478,10 +791,11 @@ class Instance:
         if not is_remote(duplicate_path):
             return False
         # do not append again if path already exists in dupe list
-        if duplicate_path in self._diff_hash_dupe_paths:
+        if duplicate_path in self._diff_hash_dupe_set:
             return False
         # if we make it here, we have a new, remote, diff hash dupe to append
         self._diff_hash_dupe_paths.append(duplicate_path)
+        self._diff_hash_dupe_set.add(duplicate_path)
         self._modified_datetime = datetime.now().isoformat()
         return True
 
@@ -547,8 +861,53 @@ class Instance:
         """
         Delete the temporary file, if it exists.
         """
-        if self._temp_file_path and os.path.exists(self._temp_file_path):
-            os.remove(self._temp_file_path)
+        # getattr, as __del__ also runs on instances whose __init__ failed, before any slot was assigned
+        temp_file_path = getattr(self, "_temp_file_path", None)
+        if temp_file_path is None:
+            return
+        try:
+            os.remove(temp_file_path)
+        except FileNotFoundError:
+            pass
+        # clear the path so repeated calls (e.g. append_to_series_tar then __del__) are a cheap no-op
+        self._temp_file_path = None
+
+    @classmethod
+    def close_archive_cache(cls):
+        """
+        Close all tar archives cached by `_open_tar` (e.g. at worker teardown, or before deleting local tars).
+        Unlike cache eviction, this closes the archives outright, so must not be called while other threads are still reading instances.
+        Cached tar mmaps are released too (they unmap once no open VirtualFile still references them).
+        """
+        with _archive_cache_lock:
+            while _archive_cache:
+                _, (_, archive) = _archive_cache.popitem()
+                archive.close()
+            _tar_mmap_cache.clear()
+
+    @classmethod
+    def close_cached_tars(cls, path: str):
+        """
+        Close the cached archives and drop the cached mmaps of the local tar at `path` (or of every tar under `path`, if it is a directory).
+        Call this before deleting local tars: until their cache entries are evicted, open handles keep a deleted tar's disk space allocated.
+        As with `close_archive_cache`, the tars must no longer be read from by other threads.
+        """
+        directory_prefix = os.path.join(path, "")
+
+        def matches(tar_file: str) -> bool:
+            return tar_file == path or tar_file.startswith(directory_prefix)
+
+        with _archive_cache_lock:
+            archives = [
+                _archive_cache.pop(tar_path)[1]
+                for tar_path in list(_archive_cache)
+                if matches(f"{tar_path}.tar")
+            ]
+            for tar_file in list(_tar_mmap_cache):
+                if matches(tar_file):
+                    del _tar_mmap_cache[tar_file]
+        for archive in archives:
+            archive.close()
 
     def __del__(self):
         """
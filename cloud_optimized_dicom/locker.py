@@ -1,6 +1,6 @@
 import logging
 
-from google.api_core.exceptions import PreconditionFailed
+from google.api_core.exceptions import NotFound, PreconditionFailed
 from google.cloud import storage
 
 from cloud_optimized_dicom.errors import LockAcquisitionError, LockVerificationError
@@ -30,8 +30,13 @@ class CODLocker:
     def acquire(self, create_if_missing: bool = True):
         """Upload a lock file (to prevent concurrent access to the COD object)."""
         # if the lock already exists, assert generation matches (re-acquisition case)
-        if (lock_blob := self.get_lock_blob()).exists():
+        # (reload() fetches the lock's metadata in one request, raising NotFound if there is no lock)
+        lock_blob = self.get_lock_blob()
+        try:
             lock_blob.reload()
+        except NotFound:
+            pass
+        else:
             lock_uri = f"gs://{lock_blob.bucket.name}/{lock_blob.name}"
             if lock_blob.generation != self.cod_object.lock_generation:
                 raise LockAcquisitionError(
@@ -46,12 +51,9 @@ class CODLocker:
         self.cod_object.get_metadata(create_if_missing=create_if_missing)
 
         # Step 2: Try to create the lock file
-        lock_blob.content_encoding = "gzip"
         try:
-            lock_blob.upload_from_string(
-                self.cod_object._metadata.to_gzipped_json(),
-                content_type="application/json",
-                if_generation_match=0,
+            self.cod_object._metadata.upload_gzipped_json(
+                lock_blob, if_generation_match=0
             )
         except PreconditionFailed:
             raise LockAcquisitionError(
@@ -66,11 +68,13 @@ class CODLocker:
 
     def verify(self) -> storage.Blob:
         """Verify that the lock file still exists and has the same generation."""
-        if not (lock_blob := self.get_lock_blob()).exists():
+        lock_blob = self.get_lock_blob()
+        try:
+            lock_blob.reload()
+        except NotFound:
             msg = "COD:LOCK:MISSING_ON_VERIFY"
             logger.critical(msg)
             raise LockVerificationError(msg)
-        lock_blob.reload()
         if lock_blob.generation != self.cod_object.lock_generation:
             msg = f"COD:LOCK:GEN_MISMATCH_ON_VERIFY:FOUND:{lock_blob.generation} != EXPECTED:{self.cod_object.lock_generation}"
             logger.critical(msg)
@@ -12,10 +12,6 @@ NAMESPACE = "cloud_optimized_dicom"
 DELETION_NAMESPACE = f"{NAMESPACE}:deletion"
 NUM_DELETES = Metrics.counter(DELETION_NAMESPACE, "num_deletes")
 BYTES_DELETED_COUNTER = Metrics.counter(DELETION_NAMESPACE, "bytes_deleted")
-DEP_DOES_NOT_EXIST = Metrics.counter(DELETION_NAMESPACE, "dep_does_not_exist")
-INSTANCE_BLOB_CRC32C_MISMATCH = Metrics.counter(
-    DELETION_NAMESPACE, "instance_blob_crc32c_mismatch"
-)
 
 # append metrics
 APPEND_NAMESPACE = f"{NAMESPACE}:append"
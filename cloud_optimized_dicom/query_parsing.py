@@ -1,5 +1,6 @@
 import logging
-from itertools import groupby
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Callable, Iterator
 
 from google.api_core.exceptions import NotFound
@@ -38,38 +39,37 @@ def query_result_to_instances(
     """Convert a bigquery results dict into a list of instances"""
     assert "files" in query_result
     assert isinstance(query_result["files"], list)
-    instances: list[Instance] = []
-    study_uid = query_result.get("study_uid")
-    series_uid = query_result.get("series_uid")
-    for file in query_result["files"]:
-        # assert uri provided
-        if not (file_uri := file.get("file_uri", None)):
+    files = query_result["files"]
+    # assert uri provided for every file before building any instances
+    for file in files:
+        if not file.get("file_uri", None):
             raise AttributeError(
                 f"'file_uri' field missing from file within query:\n{file}"
             )
-        hints = Hints(
-            size=file.get("size"),
-            crc32c=file.get("crc32c"),
-            instance_uid=file.get("instance_uid"),
-            study_uid=study_uid,
-            series_uid=series_uid,
-        )
-        # make the instance
-        instance = Instance(
-            dicom_uri=file_uri,
-            dependencies=[file_uri],
-            hints=hints,
+    study_uid = query_result.get("study_uid")
+    series_uid = query_result.get("series_uid")
+    return [
+        Instance(
+            dicom_uri=file["file_uri"],
+            dependencies=[file["file_uri"]],
+            hints=Hints(
+                size=file.get("size"),
+                crc32c=file.get("crc32c"),
+                instance_uid=file.get("instance_uid"),
+                study_uid=study_uid,
+                series_uid=series_uid,
+            ),
             uid_hash_func=uid_hash_func,
-            _original_path=file_uri,
+            _original_path=file["file_uri"],
         )
-        instances.append(instance)
-    return instances
+        for file in files
+    ]
 
 
 def get_uids_for_cod_obj(
     uid_tuple: tuple[str, str], instances: list[Instance]
 ) -> tuple[str, str]:
-    """Given the study/series UIDs from the groupby() call, which are true UIDs,
+    """Given the study/series UIDs used to group the instances, which are true UIDs,
     Determine whether hashed uids are available/should be used (all instances have a uid_hash_func provided).
     Return hashed study/series UIDs if so, otherwise return standard UIDs. Also return a bool representing whether they're hashed
     """
@@ -122,61 +122,95 @@ def instances_to_codobj_tuples(
     datastore_path: str,
     validate_datastore_path: bool = True,
     lock: bool = True,
+    max_workers: int = 16,
 ) -> Iterator[tuple[CODObject, list[Instance]]]:
-    """Group instances by study/series, make codobjects, and yield (codobj, instances) pairs"""
-    # need to set client on instances before sorting (may have to fetch them)
+    """Group instances by study/series, make codobjects, and yield (codobj, instances) pairs.
+    Up to `max_workers` codobjects are constructed (and locked) concurrently.
+    """
+    # need to set client on instances before grouping (may have to fetch them)
     for instance in instances:
         instance.transport_params = dict(client=client)
 
-    # Need study/series uids to sort/group instances. Can use hints if provided, otherwise must fetch
+    # Need study/series uids to group instances. Can use hints if provided, otherwise must fetch
     instances = fetch_instances_without_hints(instances)
 
-    # sort instances prior to grouping (groupby requires a sorted list)
-    instances.sort(
-        key=lambda x: (
-            x.study_uid(trust_hints_if_available=True),
-            x.series_uid(trust_hints_if_available=True),
+    # bucket instances by (study, series) uid in a single pass (no sort needed to group them)
+    series_groups: dict[tuple[str, str], list[Instance]] = {}
+    for instance in instances:
+        study_series_uid_tuple = (
+            instance.study_uid(trust_hints_if_available=True),
+            instance.series_uid(trust_hints_if_available=True),
         )
-    )
-
-    num_series = 0
-    for study_series_uid_tuple, series_instances in groupby(
-        instances,
-        lambda x: (
-            x.study_uid(trust_hints_if_available=True),
-            x.series_uid(trust_hints_if_available=True),
-        ),
-    ):
-        # form instances into list
-        instances_list = list(series_instances)
+        series_groups.setdefault(study_series_uid_tuple, []).append(instance)
+
+    # construct the CODObjects concurrently, as each may acquire a lock (several GCS round trips), but yield them
+    # in group order. Only a window of `max_workers` series is submitted ahead of the one being yielded,
+    # so at most that many extra locks (and series metadata) are held while the caller works through the series
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    unsubmitted = iter(series_groups.items())
+    pending: deque[tuple[Future, str, str, list[Instance]]] = deque()
+
+    def submit_next():
+        """Submit the next series (if any) for CODObject construction"""
+        study_series_uid_tuple, instances_list = next(unsubmitted, (None, None))
+        if study_series_uid_tuple is None:
+            return
         study_uid, series_uid, hashed_uids = get_uids_for_cod_obj(
             study_series_uid_tuple, instances_list
         )
-        try:
-            cod_obj = CODObject(
-                datastore_path=datastore_path,
-                client=client,
-                study_uid=study_uid,
-                series_uid=series_uid,
-                lock=lock,
-                hashed_uids=hashed_uids,
-            )
+        future = executor.submit(
+            CODObject,
+            datastore_path=datastore_path,
+            client=client,
+            study_uid=study_uid,
+            series_uid=series_uid,
+            lock=lock,
+            hashed_uids=hashed_uids,
+        )
+        pending.append((future, study_uid, series_uid, instances_list))
+
+    num_series = 0
+    try:
+        for _ in range(max_workers):
+            submit_next()
+        while pending:
+            future, study_uid, series_uid, instances_list = pending.popleft()
+            # keep the window full while we wait on (and the caller works on) this series
+            submit_next()
+            try:
+                cod_obj = future.result()
+            except LockAcquisitionError as e:
+                logger.warning(
+                    f"COD:LOCK:ACQUISITION_FAILED:STUDY:{study_uid}:SERIES:{series_uid}:{e}"
+                )
+                continue
+            except Exception as e:
+                logger.exception(
+                    f"COD:CODOBJ_INIT_FAILED:STUDY:{study_uid}:SERIES:{series_uid}:ERROR:{e}"
+                )
+                continue
             num_series += 1
             yield (cod_obj, instances_list)
-        except LockAcquisitionError as e:
-            logger.warning(
-                f"COD:LOCK:ACQUISITION_FAILED:STUDY:{study_uid}:SERIES:{series_uid}:{e}"
-            )
-        except Exception as e:
-            logger.exception(
-                f"COD:CODOBJ_INIT_FAILED:STUDY:{study_uid}:SERIES:{series_uid}:ERROR:{e}"
-            )
+    finally:
+        # if we stopped early (caller closed the generator, or an error), don't leave locks on unyielded series
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, study_uid, series_uid, _ in pending:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            cod_obj = future.result()
+            if cod_obj.lock:
+                try:
+                    cod_obj._locker.release()
+                except Exception as e:
+                    logger.exception(
+                        f"COD:LOCK:RELEASE_FAILED:STUDY:{study_uid}:SERIES:{series_uid}:ERROR:{e}"
+                    )
 
     # Log warning about series ratio after all processing
     num_instances = len(instances)
     if (
         num_instances > 1
-        and num_series / num_instances > SERIES_RATIO_WARNING_THRESHOLD
+        and num_series > num_instances * SERIES_RATIO_WARNING_THRESHOLD
     ):
         logger.warning(
             f"POOR GROUPING DETECTED: created {num_series} series for {num_instances} instances. Consider different grouping logic"
@@ -1,16 +1,186 @@
-import gzip
+import hashlib
 import json
+import math
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from io import BytesIO
-from typing import Callable, Optional
+from typing import BinaryIO, Callable, Optional
 
+import orjson
 from google.cloud import storage
 
 from cloud_optimized_dicom.instance import Instance
 from cloud_optimized_dicom.thumbnail import _sort_instances
 
+try:
+    # ISA-L's igzip is a drop-in replacement for the stdlib gzip module, with SIMD-accelerated deflate and crc32
+    from isal import igzip as gzip
 
-@dataclass
+    # isal levels only go up to 3, which compresses about as well as stdlib level 6
+    GZIP_COMPRESSLEVEL = 3
+except ImportError:
+    import gzip
+
+    # level 6 rather than the default 9: much less CPU for a marginally larger payload
+    GZIP_COMPRESSLEVEL = 6
+
+# first two bytes of any gzip stream
+GZIP_MAGIC = b"\x1f\x8b"
+
+# metadata blobs at least this large (as stored, i.e. gzipped) are downloaded as parallel ranged reads
+PARALLEL_DOWNLOAD_MIN_SIZE = 4 * 2**20
+PARALLEL_DOWNLOAD_WORKERS = 4
+
+# total size of the metadata disk cache (see _cached_blob_bytes), beyond which least recently used entries are evicted
+METADATA_CACHE_MAX_BYTES = 2**30
+
+# series with at least this many instances have their metadata streamed on upload (see write_gzipped_json)
+STREAMED_METADATA_MIN_INSTANCES = 10_000
+
+# top level metadata keys that are not user defined metadata fields
+_RESERVED_KEYS = frozenset(
+    ("study_uid", "series_uid", "deid_study_uid", "deid_series_uid", "cod")
+)
+
+# placeholder for the "cod" value in write_gzipped_json, which is encoded instance by instance
+_STREAMED_COD = object()
+
+
+def _has_non_finite_float(value) -> bool:
+    """Whether `value` (a JSON-like structure) contains a NaN or infinite float anywhere"""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, float):
+            if not math.isfinite(item):
+                return True
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return False
+
+
+def _dumps(value) -> bytes:
+    """orjson.dumps with the options used for all series metadata encoding.
+
+    orjson silently encodes NaN and Infinity as null, whereas json.dumps writes NaN/Infinity (which `from_bytes` reads back),
+    so values containing them are encoded with json instead. Any such value shows up as null in orjson's output,
+    so the (slower) search for them is only needed when the output contains a null.
+    """
+    encoded = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    if b"null" in encoded and _has_non_finite_float(value):
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return encoded
+
+
+def _download_blob_bytes(
+    blob: storage.Blob, max_workers: int = PARALLEL_DOWNLOAD_WORKERS
+) -> bytes:
+    """Download a blob, splitting large blobs into `max_workers` ranged reads issued in parallel.
+
+    `blob.size` and `blob.generation` must already be populated (e.g. by `blob.reload()`) for the parallel path to be taken.
+    Every read is pinned to the known generation, so a rewrite during the download fails it (PreconditionFailed)
+    rather than stitching together ranges of two different objects.
+    Ranged reads use `raw_download=True`, because GCS ignores ranges on blobs it transcodes (content_encoding=gzip),
+    so the stored (gzipped) bytes are returned and left for `SeriesMetadata.from_bytes` to decompress.
+    """
+    generation = blob.generation
+    if (
+        generation is None
+        or blob.size is None
+        or blob.size < PARALLEL_DOWNLOAD_MIN_SIZE
+        or max_workers < 2
+    ):
+        # pinned too when the generation is known, so the bytes always belong to that generation (see _cached_blob_bytes)
+        return blob.download_as_bytes(if_generation_match=generation)
+    chunk_size = -(-blob.size // max_workers)
+    # download_as_bytes takes an inclusive end byte
+    ranges = [
+        (start, min(start + chunk_size, blob.size) - 1)
+        for start in range(0, blob.size, chunk_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunks = executor.map(
+            lambda r: blob.download_as_bytes(
+                start=r[0],
+                end=r[1],
+                raw_download=True,
+                checksum=None,
+                if_generation_match=generation,
+            ),
+            ranges,
+        )
+        return b"".join(chunks)
+
+
+def _evict_cache_entries(cache_dir: str, max_bytes: int):
+    """Remove the least recently used entries of the disk cache in `cache_dir` until it holds at most `max_bytes`"""
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            # skip in-progress writes (see _cached_blob_bytes)
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    # entries are touched on every hit, so the oldest mtime is the least recently used
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # already evicted by a concurrent process
+            pass
+        total -= size
+
+
+def _cached_blob_bytes(
+    blob: storage.Blob, cache_dir: str, max_bytes: int = METADATA_CACHE_MAX_BYTES
+) -> bytes:
+    """Return the bytes of `blob`, reading from (or populating) a local file cache in `cache_dir`.
+
+    Entries are keyed by bucket, name and generation, so a rewritten blob (new generation) is never served stale.
+    `blob.generation` must already be populated (e.g. by `blob.reload()`); if it is not, the cache is bypassed.
+    The download is pinned to that generation, so an entry can never hold the bytes of a newer one.
+    Once the cache exceeds `max_bytes`, least recently used entries (e.g. old generations) are evicted.
+    """
+    if blob.generation is None:
+        return _download_blob_bytes(blob)
+    key = f"{blob.bucket.name}/{blob.name}@{blob.generation}"
+    cache_path = os.path.join(
+        cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest()
+    )
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        # mark the entry as recently used (mtime rather than atime, which many filesystems do not update)
+        os.utime(cache_path)
+        return data
+    except FileNotFoundError:
+        pass
+    data = _download_blob_bytes(blob)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a (dot-prefixed) temp file and rename, so concurrent readers never see a partial entry
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    _evict_cache_entries(cache_dir, max_bytes)
+    return data
+
+
+@dataclass(slots=True)
 class SeriesMetadata:
     """The metadata of an entire series.
 
@@ -32,6 +202,10 @@ class SeriesMetadata:
     instances: dict[str, Instance] = field(default_factory=dict)
     metadata_fields: dict = field(default_factory=dict)
     is_sorted: bool = False
+    # (blake2b digest of json bytes, gzipped bytes) of the last to_gzipped_json() call
+    _gzip_cache: Optional[tuple[bytes, bytes]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def _add_metadata_field(
         self, field_name: str, field_value, overwrite_existing=False
@@ -64,70 +238,129 @@ class SeriesMetadata:
         # early exit if already sorted
         if self.is_sorted:
             return
-        # map instances to their uids
-        instance_to_uid = {instance: uid for uid, instance in self.instances.items()}
-        # get a list of all instances (unsorted)
-        unsorted_instances = list(instance_to_uid.keys())
+        # map instances to their uids by identity (hashing an Instance reads its uids, which may require validation)
+        id_to_uid = {id(instance): uid for uid, instance in self.instances.items()}
         # attempt sorting
         try:
-            sorted_instances = _sort_instances(unsorted_instances, strict=True)
+            sorted_instances = _sort_instances(
+                list(self.instances.values()), strict=True
+            )
             self.instances = {
-                instance_to_uid[instance]: instance for instance in sorted_instances
+                id_to_uid[id(instance)]: instance for instance in sorted_instances
             }
             self.is_sorted = True
         except ValueError:
             self.is_sorted = False
 
-    def to_dict(self) -> dict:
+    def _top_level_dict(self, cod_value) -> dict:
+        """The top level metadata dict, with `cod_value` as the value of the "cod" key"""
         # TODO version handling once we have a new version
         study_uid_key = "deid_study_uid" if self.hashed_uids else "study_uid"
         series_uid_key = "deid_series_uid" if self.hashed_uids else "series_uid"
         base_dict = {
             study_uid_key: self.study_uid,
             series_uid_key: self.series_uid,
-            "cod": {
+            "cod": cod_value,
+        }
+        return {**base_dict, **self.metadata_fields}
+
+    def to_dict(self) -> dict:
+        return self._top_level_dict(
+            {
                 "instances": {
                     instance_uid: instance.to_cod_dict_v1()
                     for instance_uid, instance in self.instances.items()
                 },
-            },
-        }
-        return {**base_dict, **self.metadata_fields}
+            }
+        )
 
     def to_bytes(self) -> bytes:
         """Convert from SeriesMetadata -> dict -> JSON -> bytes"""
-        return json.dumps(self.to_dict()).encode("utf-8")
+        # orjson encodes straight to utf-8 bytes; OPT_NON_STR_KEYS matches json.dumps' handling of non-str keys
+        return _dumps(self.to_dict())
 
     def to_gzipped_json(self) -> bytes:
-        """Convert from SeriesMetadata -> dict -> JSON -> bytes -> gzip"""
-        # TODO if memory issues continue, can try streaming dict instead of creating it outright
-        series_dict = self.to_dict()
-        # stream the gzip file to lower memory usage
-        gzip_buffer = BytesIO()
-        with gzip.GzipFile(fileobj=gzip_buffer, mode="wb") as gz:
-            # Use a JSON encoder to stream the JSON data
-            for chunk in json.JSONEncoder().iterencode(series_dict):
-                gz.write(chunk.encode("utf-8"))
-        # once compressed, file is much smaller, so we can return the bytes directly
-        return gzip_buffer.getvalue()
+        """Convert from SeriesMetadata -> dict -> JSON -> bytes -> gzip
+
+        The same metadata is typically gzipped several times (e.g. on lock acquisition and again on upload),
+        so the result is cached against the JSON it was compressed from, and only recompressed if the JSON changed.
+        """
+        json_bytes = self.to_bytes()
+        # key on a digest rather than the JSON itself, so a full copy of the JSON is not kept alive
+        digest = hashlib.blake2b(json_bytes).digest()
+        if self._gzip_cache is not None and self._gzip_cache[0] == digest:
+            return self._gzip_cache[1]
+        gzipped = gzip.compress(json_bytes, compresslevel=GZIP_COMPRESSLEVEL)
+        self._gzip_cache = (digest, gzipped)
+        return gzipped
+
+    def write_gzipped_json(
+        self, fileobj: BinaryIO, compresslevel: int = GZIP_COMPRESSLEVEL
+    ):
+        """Write the same gzipped JSON as `to_gzipped_json` into `fileobj`, encoding one instance at a time.
+
+        Unlike `to_gzipped_json`, the full series dict (and its full JSON encoding) is never held in memory,
+        so peak memory stays flat for very large series.
+        """
+        top_level_dict = self._top_level_dict(_STREAMED_COD)
+        with gzip.GzipFile(
+            fileobj=fileobj, mode="wb", compresslevel=compresslevel
+        ) as gz:
+            gz.write(b"{")
+            for i, (key, value) in enumerate(top_level_dict.items()):
+                if i:
+                    gz.write(b",")
+                gz.write(_dumps(key) + b":")
+                # a "cod" key from metadata_fields would have replaced the placeholder, as it does in to_dict
+                if value is not _STREAMED_COD:
+                    gz.write(_dumps(value))
+                    continue
+                gz.write(b'{"instances":{')
+                for j, (instance_uid, instance) in enumerate(self.instances.items()):
+                    if j:
+                        gz.write(b",")
+                    gz.write(
+                        _dumps(instance_uid) + b":" + _dumps(instance.to_cod_dict_v1())
+                    )
+                gz.write(b"}}")
+            gz.write(b"}")
+
+    def upload_gzipped_json(self, blob: storage.Blob, **upload_kwargs):
+        """Upload this metadata as gzipped JSON to `blob`, passing `upload_kwargs` through to the upload call.
+
+        Very large series are streamed through a temp file, rather than materializing the full JSON in memory.
+        """
+        blob.content_encoding = "gzip"
+        if len(self.instances) >= STREAMED_METADATA_MIN_INSTANCES:
+            with tempfile.TemporaryFile() as metadata_file:
+                self.write_gzipped_json(metadata_file)
+                metadata_file.seek(0)
+                blob.upload_from_file(
+                    metadata_file, content_type="application/json", **upload_kwargs
+                )
+        else:
+            blob.upload_from_string(
+                self.to_gzipped_json(),
+                content_type="application/json",
+                **upload_kwargs,
+            )
 
     @classmethod
     def from_dict(
         cls, series_metadata_dict: dict, uid_hash_func: Optional[Callable] = None
     ) -> "SeriesMetadata":
-        """Class method to create an instance from a dictionary."""
+        """Class method to create an instance from a dictionary. `series_metadata_dict` is not modified."""
         # retrieve the study and series UIDs (might be de-identified)
-        if "deid_study_uid" in series_metadata_dict:
-            is_hashed = True
-            study_uid = series_metadata_dict.pop("deid_study_uid")
-            series_uid = series_metadata_dict.pop("deid_series_uid")
+        is_hashed = "deid_study_uid" in series_metadata_dict
+        if is_hashed:
+            study_uid = series_metadata_dict["deid_study_uid"]
+            series_uid = series_metadata_dict["deid_series_uid"]
         else:
-            is_hashed = False
-            study_uid = series_metadata_dict.pop("study_uid")
-            series_uid = series_metadata_dict.pop("series_uid")
+            study_uid = series_metadata_dict["study_uid"]
+            series_uid = series_metadata_dict["series_uid"]
 
         # Parse standard cod metadata
-        cod_dict: dict = series_metadata_dict.pop("cod")
+        cod_dict: dict = series_metadata_dict["cod"]
         instances = {
             instance_uid: Instance.from_cod_dict_v1(
                 instance_dict, uid_hash_func=uid_hash_func
@@ -136,7 +369,11 @@ class SeriesMetadata:
         }
 
         # Treat any remaining keys as metadata fields
-        metadata_fields = series_metadata_dict
+        metadata_fields = {
+            key: value
+            for key, value in series_metadata_dict.items()
+            if key not in _RESERVED_KEYS
+        }
 
         return cls(
             study_uid=study_uid,
@@ -150,12 +387,31 @@ class SeriesMetadata:
     def from_bytes(
         cls, bytes: bytes, uid_hash_func: Optional[Callable] = None
     ) -> "SeriesMetadata":
-        """Class method to create a SeriesMetadata object from a bytes object."""
-        return cls.from_dict(json.loads(bytes), uid_hash_func=uid_hash_func)
+        """Class method to create a SeriesMetadata object from a bytes object (JSON, or gzipped JSON)."""
+        if bytes[:2] == GZIP_MAGIC:
+            bytes = gzip.decompress(bytes)
+        try:
+            series_metadata_dict = orjson.loads(bytes)
+        except orjson.JSONDecodeError:
+            # metadata written by stdlib json may contain NaN/Infinity, which orjson rejects
+            series_metadata_dict = json.loads(bytes)
+        return cls.from_dict(series_metadata_dict, uid_hash_func=uid_hash_func)
 
     @classmethod
     def from_blob(
-        cls, blob: storage.Blob, uid_hash_func: Optional[Callable] = None
+        cls,
+        blob: storage.Blob,
+        uid_hash_func: Optional[Callable] = None,
+        cache_dir: Optional[str] = None,
     ) -> "SeriesMetadata":
-        """Class method to create a SeriesMetadata object from a GCS blob."""
-        return cls.from_bytes(blob.download_as_bytes(), uid_hash_func=uid_hash_func)
+        """Class method to create a SeriesMetadata object from a GCS blob.
+
+        If the blob's properties have been loaded (e.g. by `blob.reload()`), large blobs are downloaded with parallel ranged reads.
+        If `cache_dir` is given (and the blob's generation is known), the blob is cached on local disk by generation,
+        so repeated loads of unchanged metadata skip the download entirely.
+        """
+        if cache_dir is None:
+            data = _download_blob_bytes(blob)
+        else:
+            data = _cached_blob_bytes(blob, cache_dir)
+        return cls.from_bytes(data, uid_hash_func=uid_hash_func)
@@ -6,6 +6,7 @@ from google.cloud import storage
 
 from cloud_optimized_dicom.dicomweb import (
     STUDY_LEVEL_TAGS,
+    DicomwebRequest,
     _get_series_uid_from_blob_iterator,
     handle_request,
     is_valid_uid,
@@ -167,6 +168,23 @@ class TestDicomweb(unittest.TestCase):
         with self.assertRaises(AssertionError):
             handle_request(frame_uri, self.client)
 
+    def test_frame_request_from_uri(self):
+        """Test frames are parsed into a list, and parsed requests compare equal"""
+        frame_uri = os.path.join(
+            self.datastore_path,
+            "studies",
+            "1.2.3",
+            "series",
+            "1.2.4",
+            "instances",
+            "1.2.5",
+            "frames",
+            "1,2",
+        )
+        request = DicomwebRequest.from_uri(frame_uri)
+        self.assertEqual(request.frames, [1, 2])
+        self.assertEqual(request, DicomwebRequest.from_uri(frame_uri))
+
     def test_non_metadata_requests_raise_error(self):
         """
         Test that non-metadata requests raise an error
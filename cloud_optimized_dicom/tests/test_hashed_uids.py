@@ -64,6 +64,35 @@ class TestDeid(unittest.TestCase):
             instance.hashed_study_uid(trust_hints_if_available=True), "1.2.3.5"
         )
 
+    def test_instance_hashing_memo(self):
+        """Test hashed uids are memoized per instance, work with unhashable hash functions, and follow a replaced hash function"""
+
+        class UnhashableHashFunc:
+            __hash__ = None
+
+            def __init__(self):
+                self.calls = 0
+
+            def __call__(self, uid: str) -> str:
+                self.calls += 1
+                return example_hash_function(uid)
+
+        hash_func = UnhashableHashFunc()
+        instance = Instance(
+            dicom_uri="gs://bucket/path/to/file.dcm",
+            hints=Hints(instance_uid="1.2.3.4"),
+            uid_hash_func=hash_func,
+        )
+        for _ in range(3):
+            self.assertEqual(
+                instance.hashed_instance_uid(trust_hints_if_available=True), "1.2.3.5"
+            )
+        self.assertEqual(hash_func.calls, 1)
+        instance.uid_hash_func = lambda uid: uid + ".9"
+        self.assertEqual(
+            instance.hashed_instance_uid(trust_hints_if_available=True), "1.2.3.4.9"
+        )
+
     def test_instance_no_hash_func(self):
         """Test that trying to get a hashed uid without a hash function raises an error"""
         instance = Instance(
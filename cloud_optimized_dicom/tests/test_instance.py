@@ -1,12 +1,25 @@
+import io
 import os
+import sys
 import tarfile
 import tempfile
 import unittest
+from unittest import mock
 
 import pydicom3
+import requests
+from google.api_core.exceptions import Forbidden
 
-from cloud_optimized_dicom.instance import Instance
-from cloud_optimized_dicom.utils import is_remote
+from cloud_optimized_dicom.errors import HashMismatchError
+from cloud_optimized_dicom.hints import Hints
+from cloud_optimized_dicom.instance import Instance, _archive_cache, _tar_mmap_cache
+from cloud_optimized_dicom.utils import (
+    DICOM_PREAMBLE,
+    _batch_delete_gcs_deps,
+    find_pattern,
+    is_remote,
+    read_key_uids,
+)
 
 
 class TestInstance(unittest.TestCase):
@@ -42,6 +55,50 @@ class TestInstance(unittest.TestCase):
         with self.assertRaises(ValueError):
             instance.open()
 
+    def test_remote_tar_range_fetch_requires_offsets(self):
+        """Only remote tar members with known byte offsets are fetched with a ranged read"""
+        uri = "gs://some_series.tar://instances/some_instance.dcm"
+        self.assertFalse(Instance(dicom_uri=uri)._can_range_fetch())
+        self.assertTrue(
+            Instance(dicom_uri=uri, _byte_offsets=(1536, 2048))._can_range_fetch()
+        )
+        self.assertFalse(
+            Instance(
+                dicom_uri="/tmp/some_series.tar://instances/some_instance.dcm",
+                _byte_offsets=(1536, 2048),
+            )._can_range_fetch()
+        )
+
+    def test_remote_tar_range_fetch_checks_crc32c(self):
+        """Ranged reads of a remote tar are checked against the instance's known crc32c"""
+        with open(self.local_instance_path, "rb") as f:
+            data = f.read()
+        expected = Instance(self.local_instance_path)
+        expected.validate()
+        blob = mock.MagicMock()
+        blob.download_as_bytes.return_value = data
+        uri = "gs://bucket/some_series.tar://instances/some_instance.dcm"
+        with mock.patch(
+            "cloud_optimized_dicom.instance.storage.Blob.from_string", return_value=blob
+        ):
+            # unknown crc32c is populated from the downloaded bytes
+            instance = Instance(
+                dicom_uri=uri,
+                _byte_offsets=(1536, 1536 + len(data)),
+                transport_params={"client": mock.MagicMock()},
+            )
+            instance.validate()
+            self.assertEqual(instance._crc32c, expected._crc32c)
+            # a stale crc32c (e.g. the tar was rewritten) is caught
+            instance = Instance(
+                dicom_uri=uri,
+                _byte_offsets=(1536, 1536 + len(data)),
+                _crc32c="AAAAAA==",
+                transport_params={"client": mock.MagicMock()},
+            )
+            with self.assertRaises(HashMismatchError):
+                instance.open()
+
     def test_validate(self):
         instance = Instance(self.local_instance_path)
         self.assertIsNone(instance._instance_uid)
@@ -61,6 +118,142 @@ class TestInstance(unittest.TestCase):
         self.assertEqual(instance.series_uid(), instance._series_uid)
         self.assertEqual(instance.study_uid(), instance._study_uid)
 
+    def test_validate_tar_crc32c_matches_file(self):
+        """Test the crc32c computed while opening a tar member is the one validate keeps"""
+        expected = Instance(self.local_instance_path)
+        expected.validate()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tar_file = os.path.join(temp_dir, "series.tar")
+            with tarfile.open(tar_file, "w") as tar:
+                tar.add(self.local_instance_path, arcname="instances/test.dcm")
+            instance = Instance(f"{tar_file}://instances/test.dcm")
+            instance.validate()
+            Instance.close_archive_cache()
+        self.assertEqual(instance._crc32c, expected._crc32c)
+        self.assertEqual(instance._size, expected._size)
+
+    def test_close_cached_tars(self):
+        """Test the archive and mmap caches release a tar's handles before its directory is deleted"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tar_file = os.path.join(temp_dir, "series.tar")
+            with tarfile.open(tar_file, "w") as tar:
+                tar.add(self.local_instance_path, arcname="instances/test.dcm")
+            instance = Instance(f"{tar_file}://instances/test.dcm")
+            instance.validate()
+            self.assertIn(os.path.join(temp_dir, "series"), _archive_cache)
+            self.assertIn(tar_file, _tar_mmap_cache)
+            Instance.close_cached_tars(temp_dir)
+            self.assertNotIn(os.path.join(temp_dir, "series"), _archive_cache)
+            self.assertNotIn(tar_file, _tar_mmap_cache)
+
+    def test_validate_many(self):
+        """Test validate_many populates the same values as validate"""
+        expected = Instance(self.local_instance_path)
+        expected.validate()
+        instances = [Instance(self.local_instance_path) for _ in range(3)]
+        self.assertTrue(Instance.validate_many(instances, max_workers=2))
+        for instance in instances:
+            self.assertEqual(instance._instance_uid, expected._instance_uid)
+            self.assertEqual(instance._series_uid, expected._series_uid)
+            self.assertEqual(instance._study_uid, expected._study_uid)
+            self.assertEqual(instance._has_pixeldata, expected._has_pixeldata)
+            self.assertEqual(instance._crc32c, expected._crc32c)
+            self.assertEqual(instance._size, expected._size)
+
+    def test_validate_many_process_pool_threshold(self):
+        """Test small batches are validated inline, and large ones on a process pool, with the same results"""
+        expected = Instance(self.local_instance_path)
+        expected.validate()
+        instances = [Instance(self.local_instance_path) for _ in range(3)]
+        with mock.patch(
+            "cloud_optimized_dicom.instance.ProcessPoolExecutor",
+            side_effect=AssertionError("process pool started for a small batch"),
+        ):
+            self.assertTrue(Instance.validate_many(instances, max_workers=2))
+        with mock.patch(
+            "cloud_optimized_dicom.instance.VALIDATE_PROCESS_POOL_MIN_INSTANCES", 2
+        ):
+            pooled = [Instance(self.local_instance_path) for _ in range(3)]
+            self.assertTrue(Instance.validate_many(pooled, max_workers=2))
+        for instance in instances + pooled:
+            self.assertEqual(instance._instance_uid, expected._instance_uid)
+            self.assertEqual(instance._crc32c, expected._crc32c)
+            self.assertEqual(instance._size, expected._size)
+
+    def test_validate_many_remote_tar_member(self):
+        """Test members of remote tars are validated (by ranged read) rather than fetched"""
+        expected = Instance(self.local_instance_path)
+        expected.validate()
+        with open(self.local_instance_path, "rb") as f:
+            data = f.read()
+        instance = Instance(
+            dicom_uri="gs://bucket/series.tar://instances/test.dcm",
+            _byte_offsets=(1536, 1536 + len(data)),
+        )
+        with mock.patch.object(
+            Instance, "_open_remote_tar_range", lambda self: io.BytesIO(data)
+        ):
+            self.assertTrue(Instance.validate_many([instance], max_workers=2))
+        self.assertEqual(instance._instance_uid, expected._instance_uid)
+        self.assertEqual(instance._crc32c, expected._crc32c)
+        self.assertEqual(instance._size, expected._size)
+
+    def test_validate_many_bad_hints(self):
+        instances = [
+            Instance(self.local_instance_path),
+            Instance(self.local_instance_path, hints=Hints(size=1000)),
+        ]
+        with self.assertRaises(AssertionError):
+            Instance.validate_many(instances, max_workers=2)
+
+    def test_prefetch_preserves_order(self):
+        instances = [Instance(self.local_instance_path) for _ in range(5)]
+        prefetched = list(Instance.prefetch(instances, max_workers=2))
+        self.assertEqual([id(i) for i in prefetched], [id(i) for i in instances])
+
+    def test_find_pattern(self):
+        """Test find_pattern checks expected_index first, and otherwise falls back to scanning"""
+        data = b"junk" + DICOM_PREAMBLE + b"more junk" + DICOM_PREAMBLE
+        second = data.rindex(DICOM_PREAMBLE)
+        # expected index hit: returned even though an earlier match exists, as no scan is done
+        self.assertEqual(
+            find_pattern(io.BytesIO(data), DICOM_PREAMBLE, expected_index=second),
+            second,
+        )
+        # expected index miss: falls back to scanning for the first match
+        self.assertEqual(
+            find_pattern(io.BytesIO(data), DICOM_PREAMBLE, expected_index=0), 4
+        )
+        self.assertEqual(find_pattern(io.BytesIO(data), DICOM_PREAMBLE), 4)
+        # match spanning two windows
+        self.assertEqual(
+            find_pattern(io.BytesIO(b"a" * 7 + b"XY"), b"XY", buffer_size=8), 7
+        )
+        # a short final read must not match against stale bytes left in the buffer by the previous window
+        self.assertEqual(
+            find_pattern(io.BytesIO(b"aaYaaaaa" + b"X"), b"XY", buffer_size=8), -1
+        )
+        self.assertEqual(find_pattern(io.BytesIO(b"nothing here"), b"XY"), -1)
+
+    def test_read_key_uids(self):
+        """Test the header-walking uid reader agrees with pydicom, and declines implicit VR files"""
+        multiframe_path = os.path.join(self.test_data_dir, "ybr_rct_multiframe.dcm")
+        with open(multiframe_path, "rb") as f:
+            values = read_key_uids(f)
+        ds = pydicom3.dcmread(multiframe_path)
+        self.assertEqual(
+            values,
+            (
+                ds.SOPInstanceUID,
+                ds.SeriesInstanceUID,
+                ds.StudyInstanceUID,
+                hasattr(ds, "PixelData"),
+            ),
+        )
+        # monochrome2.dcm is implicit VR little endian, which requires the pydicom fallback
+        with open(self.local_instance_path, "rb") as f:
+            self.assertIsNone(read_key_uids(f))
+
     def test_append_to_series_tar(self):
         instance = Instance(self.local_instance_path)
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -79,6 +272,33 @@ class TestInstance(unittest.TestCase):
                     instance.size(),
                 )
 
+    def test_append_to_series_tar_long_name(self):
+        """Test byte offsets are correct when the arcname needs a long-name (>100 char) tar header"""
+        long_uid = "1." + "2" * 150
+        instance = Instance(
+            self.local_instance_path, uid_hash_func=lambda uid: long_uid
+        )
+        with open(self.local_instance_path, "rb") as f:
+            expected_bytes = f.read()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tar_file = os.path.join(temp_dir, "series.tar")
+            with tarfile.open(tar_file, "w") as tar:
+                pass
+            with tarfile.open(tar_file, "a") as tar:
+                instance.append_to_series_tar(tar)
+            start, stop = instance._byte_offsets
+            # stop is exclusive: the range covers exactly the instance's bytes
+            self.assertEqual(stop - start, len(expected_bytes))
+            with instance.open() as f:
+                self.assertEqual(f.read(), expected_bytes)
+            with tarfile.open(tar_file) as tar:
+                member = tar.getmember(f"instances/{long_uid}.dcm")
+                self.assertEqual(member.offset_data, start)
+                self.assertEqual(tar.extractfile(member).read(), expected_bytes)
+            with open(tar_file, "rb") as f:
+                f.seek(start)
+                self.assertEqual(f.read(stop - start), expected_bytes)
+
     def test_extract_metadata(self):
         instance = Instance(self.local_instance_path)
         self.assertIsNone(instance._metadata)
@@ -100,6 +320,29 @@ class TestInstance(unittest.TestCase):
         instance.delete_dependencies()
         self.assertFalse(os.path.exists(temp_file.name))
 
+    def test_batch_delete_checks_each_response(self):
+        """Test batch deletion only reports confirmed deletes, skips 404s and raises on other errors"""
+
+        def response(status_code: int) -> requests.Response:
+            r = requests.Response()
+            r.status_code = status_code
+            r._content = b""
+            r.request = requests.Request("DELETE", "https://storage").prepare()
+            return r
+
+        uris = ["gs://bucket/a.dcm", "gs://bucket/b.dcm"]
+        with mock.patch(
+            "cloud_optimized_dicom.utils._send_delete_batch",
+            return_value=[response(204), response(404)],
+        ):
+            self.assertEqual(_batch_delete_gcs_deps(uris, client=None), uris[:1])
+        with mock.patch(
+            "cloud_optimized_dicom.utils._send_delete_batch",
+            return_value=[response(204), response(403)],
+        ):
+            with self.assertRaises(Forbidden):
+                _batch_delete_gcs_deps(uris, client=None)
+
     def test_open_invalid_file(self):
         """Test that we raise an error if the file is not a dicom file"""
         instance = Instance(dicom_uri=f"{os.path.dirname(__file__)}/test_appender.py")
@@ -112,6 +355,18 @@ class TestInstance(unittest.TestCase):
         assert instance._has_pixeldata is None  # Verify it's None before fetch
         self.assertTrue(instance.has_pixeldata)
 
+    def test_failed_init_cleanup(self):
+        """Test that __del__ of an instance whose __init__ failed does not raise (hiding the real error)"""
+        unraisable = []
+        original_hook = sys.unraisablehook
+        sys.unraisablehook = unraisable.append
+        try:
+            with self.assertRaises(TypeError):
+                Instance(not_a_field=True)
+        finally:
+            sys.unraisablehook = original_hook
+        self.assertEqual(unraisable, [])
+
     def test_temp_file_cleanup(self):
         """Test that the temp file is cleaned up when the instance is deleted"""
         # make a temp file with valid dicom data
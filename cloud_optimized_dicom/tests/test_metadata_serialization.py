@@ -1,8 +1,42 @@
+import gzip
+import io
 import json
+import math
 import os
+import tempfile
 import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-from cloud_optimized_dicom.series_metadata import SeriesMetadata
+from cloud_optimized_dicom.series_metadata import (
+    PARALLEL_DOWNLOAD_MIN_SIZE,
+    SeriesMetadata,
+    _cached_blob_bytes,
+    _download_blob_bytes,
+)
+
+
+class _FakeBlob:
+    """Stands in for a loaded storage.Blob, serving (inclusive) byte ranges of `data`"""
+
+    def __init__(self, data: bytes, generation: int = None):
+        self.data = data
+        self.size = len(data)
+        self.ranges = []
+        # if_generation_match of each read
+        self.pinned_generations = []
+        self.bucket = SimpleNamespace(name="some-bucket")
+        self.name = "some_series/metadata.json"
+        self.generation = generation
+
+    def download_as_bytes(
+        self, start=None, end=None, if_generation_match=None, **kwargs
+    ):
+        self.ranges.append((start, end))
+        self.pinned_generations.append(if_generation_match)
+        if start is None:
+            return self.data
+        return self.data[start : end + 1]
 
 
 class TestMetadataSerialization(unittest.TestCase):
@@ -114,3 +148,148 @@ class TestMetadataSerialization(unittest.TestCase):
             raw_dict = json.loads(raw_bytes)
             saved_dict = SeriesMetadata.from_bytes(raw_bytes).to_dict()
         self._assert_save_success(raw_dict, saved_dict, is_deid=True)
+
+    def test_gzipped_json_cache(self):
+        """Test that to_gzipped_json reuses its output until the metadata changes"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            metadata = SeriesMetadata.from_bytes(f.read())
+        first = metadata.to_gzipped_json()
+        self.assertIs(metadata.to_gzipped_json(), first)
+        self.assertEqual(json.loads(gzip.decompress(first)), metadata.to_dict())
+        # changing the metadata must invalidate the cache
+        metadata._add_metadata_field("new_field", "new_value")
+        second = metadata.to_gzipped_json()
+        self.assertIsNot(second, first)
+        self.assertEqual(json.loads(gzip.decompress(second))["new_field"], "new_value")
+        # including a change that keeps the JSON the same length
+        metadata._add_metadata_field("new_field", "old_value", overwrite_existing=True)
+        third = metadata.to_gzipped_json()
+        self.assertEqual(json.loads(gzip.decompress(third))["new_field"], "old_value")
+
+    def test_write_gzipped_json(self):
+        """Test that streaming the gzipped json produces the same json as to_bytes"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            metadata = SeriesMetadata.from_bytes(f.read())
+        buffer = io.BytesIO()
+        metadata.write_gzipped_json(buffer)
+        self.assertEqual(gzip.decompress(buffer.getvalue()), metadata.to_bytes())
+
+    def test_upload_gzipped_json(self):
+        """Test that large series are uploaded from a streamed temp file, and small ones from memory"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            metadata = SeriesMetadata.from_bytes(f.read())
+        uploaded = []
+        blob = mock.MagicMock()
+        blob.upload_from_file.side_effect = lambda f, **kwargs: uploaded.append(
+            f.read()
+        )
+        blob.upload_from_string.side_effect = lambda data, **kwargs: uploaded.append(
+            data
+        )
+        metadata.upload_gzipped_json(blob, if_generation_match=0)
+        with mock.patch(
+            "cloud_optimized_dicom.series_metadata.STREAMED_METADATA_MIN_INSTANCES", 1
+        ):
+            metadata.upload_gzipped_json(blob, if_generation_match=0)
+        self.assertEqual(blob.upload_from_string.call_count, 1)
+        self.assertEqual(blob.upload_from_file.call_count, 1)
+        self.assertEqual(
+            blob.upload_from_file.call_args.kwargs["if_generation_match"], 0
+        )
+        self.assertEqual(blob.content_encoding, "gzip")
+        for data in uploaded:
+            self.assertEqual(gzip.decompress(data), metadata.to_bytes())
+
+    def test_gzipped_metadata_load(self):
+        """Test that from_bytes also accepts gzipped json"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            metadata = SeriesMetadata.from_bytes(gzip.compress(f.read()))
+        self._assert_load_success(metadata)
+
+    def test_parallel_blob_download(self):
+        """Test large blobs are reassembled correctly from parallel ranged reads, all pinned to one generation"""
+        data = os.urandom(PARALLEL_DOWNLOAD_MIN_SIZE + 3)
+        blob = _FakeBlob(data, generation=7)
+        self.assertEqual(_download_blob_bytes(blob, max_workers=4), data)
+        self.assertEqual(len(blob.ranges), 4)
+        self.assertEqual(blob.pinned_generations, [7] * 4)
+        # without a known generation the ranges could not be pinned, so a single request is used
+        blob = _FakeBlob(data)
+        self.assertEqual(_download_blob_bytes(blob, max_workers=4), data)
+        self.assertEqual(blob.ranges, [(None, None)])
+        # small blobs are downloaded in a single request
+        blob = _FakeBlob(data[:1024])
+        self.assertEqual(_download_blob_bytes(blob, max_workers=4), data[:1024])
+        self.assertEqual(blob.ranges, [(None, None)])
+
+    def test_cached_blob_bytes(self):
+        """Test the metadata disk cache is hit for the same generation, and missed for a new one"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            data = f.read()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            blob = _FakeBlob(data, generation=1)
+            self.assertEqual(_cached_blob_bytes(blob, cache_dir), data)
+            self.assertEqual(_cached_blob_bytes(blob, cache_dir), data)
+            self.assertEqual(len(blob.ranges), 1)
+            blob.generation = 2
+            self.assertEqual(_cached_blob_bytes(blob, cache_dir), data)
+            self.assertEqual(len(blob.ranges), 2)
+            # each download was pinned to the generation it is cached under
+            self.assertEqual(blob.pinned_generations, [1, 2])
+            self._assert_load_success(
+                SeriesMetadata.from_blob(blob, cache_dir=cache_dir)
+            )
+            self.assertEqual(len(blob.ranges), 2)
+
+    def test_cached_blob_bytes_eviction(self):
+        """Test the least recently used entries are evicted once the metadata disk cache is full"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            blobs = [_FakeBlob(b"x" * 100, generation=g) for g in range(3)]
+            # cache the first two, with the second more recently written than the first
+            for i, blob in enumerate(blobs[:2]):
+                existing = set(os.listdir(cache_dir))
+                _cached_blob_bytes(blob, cache_dir, max_bytes=250)
+                (entry,) = set(os.listdir(cache_dir)) - existing
+                os.utime(os.path.join(cache_dir, entry), (i, i))
+            # a hit on the first makes the second the least recently used
+            _cached_blob_bytes(blobs[0], cache_dir, max_bytes=250)
+            # so a third entry exceeds the limit, evicting the second
+            _cached_blob_bytes(blobs[2], cache_dir, max_bytes=250)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+            _cached_blob_bytes(blobs[0], cache_dir, max_bytes=250)
+            self.assertEqual(len(blobs[0].ranges), 1)
+            _cached_blob_bytes(blobs[1], cache_dir, max_bytes=250)
+            self.assertEqual(len(blobs[1].ranges), 2)
+
+    def test_from_dict_does_not_mutate_input(self):
+        """Test from_dict leaves the input dict intact, and keeps non-reserved keys as metadata fields"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            metadata_dict = json.load(f)
+        metadata_dict["some_field"] = "some_value"
+        original = json.loads(json.dumps(metadata_dict))
+        metadata = SeriesMetadata.from_dict(metadata_dict)
+        self.assertEqual(metadata_dict, original)
+        self.assertEqual(metadata.metadata_fields["some_field"], "some_value")
+        self.assertNotIn("cod", metadata.metadata_fields)
+        self._assert_load_success(metadata)
+
+    def test_non_finite_float_roundtrip(self):
+        """Test NaN and Infinity survive serialization (orjson alone would turn them into null)"""
+        with open(os.path.join(self.test_data_dir, "valid_metadata.json"), "rb") as f:
+            metadata = SeriesMetadata.from_bytes(f.read())
+        metadata._add_metadata_field("nan_field", float("nan"))
+        instance = metadata.instances["instance_uid_1"]
+        instance._metadata["00181318"] = {"vr": "FD", "Value": [float("inf")]}
+        buffer = io.BytesIO()
+        metadata.write_gzipped_json(buffer)
+        for serialized in (
+            metadata.to_bytes(),
+            metadata.to_gzipped_json(),
+            buffer.getvalue(),
+        ):
+            loaded = SeriesMetadata.from_bytes(serialized)
+            self.assertTrue(math.isnan(loaded.metadata_fields["nan_field"]))
+            self.assertEqual(
+                loaded.instances["instance_uid_1"].metadata["00181318"]["Value"],
+                [float("inf")],
+            )
@@ -1,4 +1,6 @@
 import io
+import mmap
+import tempfile
 import unittest
 
 from cloud_optimized_dicom.virtual_file import VirtualFile
@@ -120,6 +122,36 @@ class TestVirtualFile(unittest.TestCase):
             self.assertEqual(vf.read(), b"23456")
         self.assertTrue(mock_file.closed)
 
+    def test_close_master_false(self):
+        """Test that a virtual file over a shared master does not close it"""
+        mock_file = io.BytesIO(b"0123456789")
+        with VirtualFile(mock_file, 2, 7, close_master=False) as vf:
+            self.assertEqual(vf.read(), b"23456")
+        self.assertFalse(mock_file.closed)
+
+    # Shared master tests
+    def test_shared_master_independent_positions(self):
+        """Test that virtual files sharing a master file keep their own positions"""
+        other = VirtualFile(self.master_file, 5, 9)
+        self.assertEqual(self.virtual_file.read(2), b"23")
+        self.assertEqual(other.read(2), b"56")
+        self.assertEqual(self.virtual_file.read(2), b"45")
+        self.assertEqual(other.read(), b"78")
+
+    def test_mmap_master(self):
+        """Test reading/seeking a virtual file backed by an mmap"""
+        with tempfile.TemporaryFile() as f:
+            f.write(self.mock_content)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                vf = VirtualFile(mapping, 2, 7, close_master=False)
+                self.assertEqual(vf.read(2), b"23")
+                vf.seek(-2, io.SEEK_END)
+                self.assertEqual(vf.read(), b"56")
+                self.assertEqual(vf.tell(), 5)
+                vf.close()
+                self.assertFalse(mapping.closed)
+
     # Write tests
     def test_writable(self):
         """Test that VirtualFile is not writable"""
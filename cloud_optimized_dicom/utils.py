@@ -1,44 +1,100 @@
 DICOM_PREAMBLE = b"\x00" * 128 + b"DICM"
-REMOTE_IDENTIFIERS = ["http", "s3://", "gs://"]
+REMOTE_IDENTIFIERS = ("http", "s3://", "gs://")
+# explicit VRs whose element header has 2 reserved bytes + a 4 byte length (rather than a 2 byte length)
+_LONG_LENGTH_VRS = frozenset(
+    {
+        b"OB",
+        b"OD",
+        b"OF",
+        b"OL",
+        b"OV",
+        b"OW",
+        b"SQ",
+        b"SV",
+        b"UC",
+        b"UN",
+        b"UR",
+        b"UT",
+        b"UV",
+    }
+)
+# transfer syntaxes that are NOT explicit VR little endian (implicit VR, big endian, deflated)
+_NON_EXPLICIT_LE_SYNTAXES = frozenset(
+    {"1.2.840.10008.1.2", "1.2.840.10008.1.2.2", "1.2.840.10008.1.2.1.99"}
+)
+_UNDEFINED_LENGTH = 0xFFFFFFFF
+_PIXEL_DATA_TAG = 0x7FE00010
+_SEQUENCE_DELIMITER_TAG = 0xFFFEE0DD
+_ITEM_DELIMITER_TAG = 0xFFFEE00D
 UID_TAGS = {
     "instance_uid": "00080018",
     "series_uid": "0020000E",
     "study_uid": "0020000D",
 }
 
-import collections
 import io
 import logging
+import os
+import struct
 from base64 import b64encode
+from functools import lru_cache
 from typing import Optional
 
 import cv2
 import filetype
+import google.auth
 import google_crc32c
 import numpy as np
+from google.api_core.exceptions import NotFound, from_http_response
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import storage
+from google.cloud.storage.batch import Batch
 from google.cloud.storage.retry import DEFAULT_RETRY
+from requests.adapters import HTTPAdapter
 
 import cloud_optimized_dicom.metrics as metrics
 from cloud_optimized_dicom.errors import CleanOpOnUnlockedCODObjectError
 
 logger = logging.getLogger(__name__)
 
+# google_crc32c silently falls back to a pure-python implementation if its C extension is unavailable,
+# which is orders of magnitude slower for the per-instance checksums COD computes
+if google_crc32c.implementation != "c":
+    logger.warning(
+        f"google_crc32c is using its {google_crc32c.implementation} implementation; crc32c computation will be slow"
+    )
 
-def find_pattern(f: io.BufferedReader, pattern: bytes, buffer_size=8192):
+
+def find_pattern(
+    f: io.BufferedReader,
+    pattern: bytes,
+    buffer_size=2**16,
+    expected_index: Optional[int] = None,
+):
     """
-    Finds the pattern from file like object and gives index found or returns -1
+    Finds the pattern from file like object and gives index found or returns -1.
+    If `expected_index` is provided, the bytes at that (relative) position are checked first,
+    and the windowed search is only performed if the pattern is not there.
     """
     assert len(pattern) < buffer_size
     size = len(pattern)
     overlap_size = size - 1
     start_position = f.tell()
+
+    # happy path: pattern is exactly where we expect it, no need to scan
+    if expected_index is not None:
+        f.seek(start_position + expected_index)
+        if f.read(size) == pattern:
+            return expected_index
+        f.seek(start_position)
+
     windowed_bytes = bytearray(buffer_size)
 
     # Read the initial buffer
     while num_bytes := f.readinto(windowed_bytes):
         # Search for the pattern in the current byte window
-        index = windowed_bytes.find(pattern)
+        # (bounded to num_bytes, as the tail of the buffer may hold stale bytes from the previous read)
+        index = windowed_bytes.find(pattern, 0, num_bytes)
         if index != -1:
             # found the index, return the relative position
             return f.tell() - start_position - num_bytes + index
@@ -53,11 +109,63 @@ def find_pattern(f: io.BufferedReader, pattern: bytes, buffer_size=8192):
     return -1
 
 
+def sendfile_copy(src: io.BufferedReader, dst: io.BufferedRandom, count: int):
+    """
+    Copy `count` bytes from the current position of `src` to the current position of `dst`.
+    Uses `os.sendfile` so the bytes are copied kernel-side rather than bounced through python,
+    falling back to a buffered read/write loop where sendfile is unavailable (non-linux, non-regular files).
+    On return, `dst` is positioned just after the copied bytes.
+    """
+    # anything still buffered in dst must hit the fd before the kernel writes after it
+    dst.flush()
+    dst_start = dst.tell()
+    src_start = src.tell()
+    copied = 0
+    try:
+        while copied < count:
+            sent = os.sendfile(
+                dst.fileno(), src.fileno(), src_start + copied, count - copied
+            )
+            if sent == 0:
+                raise EOFError(f"Expected {count} bytes but source ended at {copied}")
+            copied += sent
+    except (AttributeError, OSError):
+        # only fall back if sendfile failed outright; a partial copy is a real error
+        if copied > 0:
+            raise
+        src.seek(src_start)
+        while copied < count:
+            chunk = src.read(min(count - copied, 2**20))
+            if not chunk:
+                raise EOFError(f"Expected {count} bytes but source ended at {copied}")
+            dst.write(chunk)
+            copied += len(chunk)
+    # sendfile moved the fd position behind dst's back, so re-sync the buffered object
+    dst.seek(dst_start + count)
+
+
+def read_at(f, offset: int, size: int) -> bytes:
+    """
+    Read up to `size` bytes at `offset` of `f`, without moving its position.
+    Uses a single `os.pread` when `f` is backed by a real file descriptor,
+    falling back to seek/read/seek for in-memory and virtual files.
+    """
+    try:
+        fd = f.fileno()
+    except (AttributeError, OSError):
+        position = f.tell()
+        f.seek(offset)
+        data = f.read(size)
+        f.seek(position)
+        return data
+    return os.pread(fd, size, offset)
+
+
 def is_remote(uri: str) -> bool:
     """
     Check if the URI is remote.
     """
-    return any(uri.startswith(prefix) for prefix in REMOTE_IDENTIFIERS)
+    return uri.startswith(REMOTE_IDENTIFIERS)
 
 
 def upload_and_count_file(blob: storage.Blob, file_path: str):
@@ -102,6 +210,80 @@ def _delete_gcs_dep(uri: str, client: storage.Client, expected_crc32c: str = Non
     return True
 
 
+# maximum number of calls the GCS JSON API accepts in a single batch request
+GCS_MAX_BATCH_SIZE = 100
+# batch sub-request statuses that are retried individually (request timeout, rate limiting and server errors)
+_TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class _ResponseBatch(Batch):
+    """A `Batch` that keeps the responses returned by `finish` (which the context manager discards)"""
+
+    responses: list = None
+
+    def finish(self, raise_exception=True):
+        self.responses = super().finish(raise_exception=raise_exception)
+        return self.responses
+
+
+def _send_delete_batch(uris: list[str], client: storage.Client) -> list:
+    """Send a single batch request deleting `uris`. Returns the sub-response of each delete, in the same order as `uris`."""
+    batch = _ResponseBatch(client=client, raise_exception=False)
+    with batch:
+        for uri in uris:
+            storage.Blob.from_string(uri, client=client).delete()
+    # with raise_exception=False, failed sub-requests are left in the responses rather than raised
+    return batch.responses
+
+
+def _batch_delete_gcs_deps(uris: list[str], client: storage.Client) -> list[str]:
+    """
+    Delete several dependencies from GCS in batch (multipart) requests of up to `GCS_MAX_BATCH_SIZE` deletes,
+    rather than one request each.
+    Unlike `_delete_gcs_dep`, there is no existence or hash check (both would cost a GET per blob).
+    Instead, the status of each delete is checked: blobs that no longer exist (404) are skipped,
+    transient failures (429, 5xx) are retried individually, and any other failure is raised.
+    Args:
+        uris: list[str] - The URIs of the dependencies to delete.
+        client: storage.Client - The client to use to delete the blobs.
+    Returns:
+        list[str] - The URIs that were actually deleted.
+    """
+    deleted = []
+    try:
+        for i in range(0, len(uris), GCS_MAX_BATCH_SIZE):
+            chunk = uris[i : i + GCS_MAX_BATCH_SIZE]
+            # deletes are idempotent (a repeated delete is just a 404), so the whole batch is safe to retry
+            responses = DEFAULT_RETRY(_send_delete_batch)(chunk, client)
+            for uri, response in zip(chunk, responses):
+                if 200 <= response.status_code < 300:
+                    deleted.append(uri)
+                elif response.status_code == 404:
+                    metrics.DEP_DOES_NOT_EXIST.inc()
+                    logger.warning(f"Skipping deletion of {uri} due to non-existence")
+                elif response.status_code in _TRANSIENT_STATUS_CODES:
+                    if _retry_delete_gcs_dep(uri, client):
+                        deleted.append(uri)
+                else:
+                    raise from_http_response(response)
+    finally:
+        # count whatever was confirmed deleted, even if a later delete raised
+        metrics.NUM_DELETES.inc(len(deleted))
+    return deleted
+
+
+def _retry_delete_gcs_dep(uri: str, client: storage.Client) -> bool:
+    """Delete a single blob whose batched delete failed transiently, with the usual retry policy.
+    Returns False (rather than raising) if the blob turns out not to exist."""
+    try:
+        storage.Blob.from_string(uri, client=client).delete(retry=DEFAULT_RETRY)
+    except NotFound:
+        metrics.DEP_DOES_NOT_EXIST.inc()
+        logger.warning(f"Skipping deletion of {uri} due to non-existence")
+        return False
+    return True
+
+
 def file_is_dicom(instance_path: str) -> bool:
     """use filetype.guess to verify {instance_path} is indeed dicom"""
     guess_result = filetype.guess(instance_path)
@@ -110,6 +292,37 @@ def file_is_dicom(instance_path: str) -> bool:
     return True
 
 
+@lru_cache(maxsize=None)
+def _get_gcs_client(project: Optional[str] = None) -> storage.Client:
+    """
+    Return a process-wide default `storage.Client` (one per project), for when the caller did not supply one.
+    Constructing a client resolves credentials and builds a new HTTP session, so this should not be done per blob.
+    """
+    return storage.Client(project=project)
+
+
+def create_pooled_storage_client(
+    project: Optional[str] = None, pool_size: int = 64, **client_kwargs
+) -> storage.Client:
+    """
+    Create a `storage.Client` whose HTTP session keeps up to `pool_size` connections alive.
+    The default session only pools 10 connections, so concurrent reads (e.g. many dicomweb requests sharing a client)
+    end up re-establishing connections and paying a TLS handshake each time. Create one of these and share it.
+    Any extra kwargs (e.g. `client_options`) are passed through to `storage.Client`.
+    """
+    credentials, default_project = google.auth.default(scopes=storage.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    # pass the credentials too, or the client resolves its own (used e.g. for signing URLs) separately from the session
+    return storage.Client(
+        project=project or default_project,
+        credentials=credentials,
+        _http=session,
+        **client_kwargs,
+    )
+
+
 def delete_uploaded_blobs(client: storage.Client, uris_to_delete: list[str]):
     """
     Helper method used by tests to delete blobs they have created, resetting the test
@@ -133,9 +346,136 @@ def generate_ptr_crc32c(ptr: io.BufferedReader, blocksize: int = 2**20) -> str:
     Compare with a google storage blob instance:
       blob.crc32c == generate_ptr_crc32c(open("path/to/local/file.txt", "rb"))
     """
+    return generate_ptr_crc32c_and_size(ptr, blocksize)[0]
+
+
+def generate_ptr_crc32c_and_size(
+    ptr: io.BufferedReader, blocksize: int = 2**20
+) -> tuple[str, int]:
+    """
+    Same as `generate_ptr_crc32c`, but also return the number of bytes read (i.e. the size of the file),
+    which comes for free since every byte has to be read to checksum it anyway.
+    """
     crc = google_crc32c.Checksum()
-    collections.deque(crc.consume(ptr, blocksize), maxlen=0)
-    return b64encode(crc.digest()).decode("utf-8")
+    size = sum(map(len, crc.consume(ptr, blocksize)))
+    return b64encode(crc.digest()).decode("utf-8"), size
+
+
+class Crc32cWriter:
+    """
+    Minimal write-only file wrapper that computes the crc32c (and size) of everything written through it.
+    Lets a download be checksummed as it streams to disk, instead of re-reading the file afterwards.
+    """
+
+    def __init__(self, fileobj: io.BufferedWriter):
+        self.fileobj = fileobj
+        self.size = 0
+        self._crc = google_crc32c.Checksum()
+
+    def write(self, data: bytes) -> int:
+        # the google_crc32c C extension only accepts bytes (not bytearray/memoryview)
+        self._crc.update(data if isinstance(data, bytes) else bytes(data))
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def crc32c(self) -> str:
+        """base64 encoded crc32c of the bytes written so far (same format as `generate_ptr_crc32c`)"""
+        return b64encode(self._crc.digest()).decode("utf-8")
+
+
+def _read_explicit_le_header(f: io.BufferedReader) -> Optional[tuple[int, bytes, int]]:
+    """Read one explicit VR little endian element header, returning (tag, vr, length), or None at EOF"""
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    group, element = struct.unpack_from("<HH", header)
+    tag = (group << 16) | element
+    # item/delimiter tags have no VR, just a 4 byte length
+    if group == 0xFFFE:
+        return tag, b"", struct.unpack_from("<I", header, 4)[0]
+    vr = header[4:6]
+    if vr in _LONG_LENGTH_VRS:
+        length_bytes = f.read(4)
+        if len(length_bytes) < 4:
+            return None
+        return tag, vr, struct.unpack("<I", length_bytes)[0]
+    return tag, vr, struct.unpack_from("<H", header, 6)[0]
+
+
+def _skip_undefined_length(f: io.BufferedReader, end_tag: int):
+    """Skip elements (recursing into nested undefined length values) until `end_tag` is read"""
+    while (header := _read_explicit_le_header(f)) is not None:
+        tag, _, length = header
+        if tag == end_tag:
+            return
+        if length == _UNDEFINED_LENGTH:
+            # an undefined length item ends in an item delimiter, anything else (sequence, encapsulated pixel data) in a sequence delimiter
+            nested_end = (
+                _ITEM_DELIMITER_TAG if tag == 0xFFFEE000 else _SEQUENCE_DELIMITER_TAG
+            )
+            _skip_undefined_length(f, nested_end)
+        else:
+            f.seek(length, io.SEEK_CUR)
+    raise EOFError("Reached end of file inside undefined length element")
+
+
+def read_key_uids(
+    f: io.BufferedReader,
+) -> Optional[tuple[str, str, str, bool]]:
+    """
+    Read (instance_uid, series_uid, study_uid, has_pixeldata) from a DICOM file by walking its element headers,
+    seeking past every value except the three UIDs (so large values like PixelData are never read).
+    Only explicit VR little endian datasets (which includes encapsulated/compressed transfer syntaxes) are supported:
+    returns None for other transfer syntaxes or anything unexpected, in which case the caller should fall back to pydicom.
+    """
+    try:
+        if f.read(132)[128:] != b"DICM":
+            return None
+        # file meta group (0002,xxxx) is always explicit VR little endian
+        transfer_syntax = None
+        while True:
+            position = f.tell()
+            header = _read_explicit_le_header(f)
+            if header is None:
+                return None
+            tag, vr, length = header
+            if tag >> 16 != 0x0002:
+                f.seek(position)
+                break
+            if tag == 0x00020010:
+                transfer_syntax = f.read(length).rstrip(b"\x00 ").decode("ascii")
+            else:
+                f.seek(length, io.SEEK_CUR)
+        if transfer_syntax is None or transfer_syntax in _NON_EXPLICIT_LE_SYNTAXES:
+            return None
+
+        uid_tags = {
+            int(UID_TAGS["instance_uid"], 16): 0,
+            int(UID_TAGS["series_uid"], 16): 1,
+            int(UID_TAGS["study_uid"], 16): 2,
+        }
+        uids = [None, None, None]
+        has_pixeldata = False
+        while (header := _read_explicit_le_header(f)) is not None:
+            tag, vr, length = header
+            # elements are sorted by tag, so once we reach pixel data there is nothing left we need
+            if tag >= _PIXEL_DATA_TAG:
+                has_pixeldata = tag == _PIXEL_DATA_TAG
+                break
+            if tag in uid_tags and vr == b"UI":
+                uids[uid_tags[tag]] = f.read(length).rstrip(b"\x00 ").decode("ascii")
+            elif length == _UNDEFINED_LENGTH:
+                _skip_undefined_length(f, _SEQUENCE_DELIMITER_TAG)
+            else:
+                f.seek(length, io.SEEK_CUR)
+        if None in uids:
+            return None
+        return uids[0], uids[1], uids[2], has_pixeldata
+    except (struct.error, UnicodeDecodeError, EOFError, OSError):
+        return None
 
 
 def parse_uids_from_metadata(
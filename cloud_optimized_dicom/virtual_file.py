@@ -1,4 +1,6 @@
 import io
+import mmap
+from typing import Union
 
 
 class VirtualFile:
@@ -10,34 +12,51 @@ class VirtualFile:
 
     This class simulates a smaller file within the master file, with virtual start and stop byte positions.
 
-    Example: read instance.dcm (byte range 1000-2000) from within series.tar:
+    Example: read instance.dcm (bytes 1000 up to, but not including, 2000) from within series.tar:
     ```
     with open("series.tar", "rb") as tar_file:
-        start, stop = byte_offsets
-        virtual_file = VirtualFile(tar_file, 1000, 2000 + 1)
+        start, stop = byte_offsets  # (1000, 2000)
+        virtual_file = VirtualFile(tar_file, start, stop)
         ds = pydicom.dcmread(virtual_file)
     ```
     """
 
-    def __init__(self, master_file: io.BufferedReader, start: int, stop: int):
+    def __init__(
+        self,
+        master_file: Union[io.BufferedReader, mmap.mmap],
+        start: int,
+        stop: int,
+        close_master: bool = True,
+    ):
         self.master_file = master_file
         self.start = start
         self.stop = stop
-        # Seek to start of virtual file
-        self.master_file.seek(self.start)
+        # whether closing the virtual file also closes the master file (disable when the master is shared)
+        self.close_master = close_master
+        # the virtual file tracks its own (absolute) position rather than relying on the master file's,
+        # so that several virtual files can safely share one master (e.g. a cached mmap of a tar)
+        self._position = start
+        # mmaps can be sliced directly, without touching (shared) file position state
+        self._is_mmap = isinstance(master_file, mmap.mmap)
 
     def read(self, size=-1):
         # If already at/past end, return empty bytes (mimics true read behavior)
-        if self.master_file.tell() >= self.stop:
+        if self._position >= self.stop:
             return b""
 
         # At most we can read from the current position to the end of the virtual file
-        max_read_size = self.stop - self.master_file.tell()
-        if size < 0:
+        max_read_size = self.stop - self._position
+        if size is None or size < 0:
             size = max_read_size
         else:
             size = min(size, max_read_size)
-        return self.master_file.read(size)
+        if self._is_mmap:
+            data = self.master_file[self._position : self._position + size]
+        else:
+            self.master_file.seek(self._position)
+            data = self.master_file.read(size)
+        self._position += len(data)
+        return data
 
     def seek(self, virtual_offset, whence=io.SEEK_SET):
         # Determine the new position relative to the start of the master file
@@ -46,25 +65,27 @@ class VirtualFile:
                 raise ValueError("negative seek position")
             new_position = self.start + virtual_offset
         elif whence == io.SEEK_CUR:
-            new_position = self.master_file.tell() + virtual_offset
+            new_position = self._position + virtual_offset
             # Clamp to start of virtual file if seeking before start with SEEK_CUR
             if new_position < self.start:
                 new_position = self.start
         elif whence == io.SEEK_END:
             new_position = self.stop + virtual_offset
 
-        return self.master_file.seek(new_position)
+        self._position = new_position
+        return self.tell()
 
     def tell(self):
-        return self.master_file.tell() - self.start
+        return self._position - self.start
 
     def writable(self):
         """VirtualFiles do not support writing"""
         return False
 
     def close(self):
-        # When virtual file is closed, the master file should also be closed
-        self.master_file.close()
+        # When virtual file is closed, the master file should also be closed (unless it is shared)
+        if self.close_master:
+            self.master_file.close()
 
     # Context manager support
     def __enter__(self):
@@ -23,8 +23,12 @@ setup(
         "pydicom3 @ git+https://github.com/gradienthealth/pydicom-3.git",
         "opencv-python-headless==4.11.0.86",
         "ffmpeg-python==0.2.0",
+        "orjson==3.10.15",
     ],
     extras_require={
+        "isal": [
+            "isal",
+        ],
         "test": [
             "pydicom==2.3.0",
             "matplotlib",